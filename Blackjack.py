@@ -4,16 +4,27 @@ Blackjack - blackjack card-game player
 Soft17 - Blackjack with typical dealer strategy 
 Basic - Blackjack with basic strategy
 """
+import os
 from Card import Card
 
+STAY, HIT, DOUBLE = 0, 1, 2               # decisions as small ints
+CHOICES = ('stay', 'hit', 'double')       # decision names, indexed by decision
+UP_CARDS = '23456789TA'                   # dealer up-card columns of the strategy charts
+UP_COLUMN = tuple(9 if card.points == 1 else card.points - 2 for card in Card.by_ordinal)
+TOTALS = 32                               # hand totals (Ace=1) covered by compiled tables
+
 
 class Blackjack(object):
     """Blackjack card-game player. The player represents an automaton that
     plays the blackjack game. 
     
     This base class handles the game logistics:
-        hand - list of cards in player's hand
         value - the sum of the point values for the cards in the hand (Ace=1)
+        has_ace - True if the hand holds an Ace
+        soft - True if an Ace can count as 11 (has_ace and value <= 11)
+        ncards - number of cards in the hand
+        pair - True if the first two cards are of the same rank
+        hand - list of cards in the hand, only kept if keep_cards is True (else None)
         soft_value() - point value, promoting any Ace to 11, if possible
         busted() - True if value > 21
         has_bj() - True if hand is A + ten card
@@ -24,22 +35,33 @@ class Blackjack(object):
         dealt(cards) - Informs the player of her first two cards dealt during the deal
         choose(dlr_up) - Player informs the dealer of her choice, 'stay', 'hit', or 'double'
         hit(card) - Card dealt in response to a 'hit' or 'double' choice
+        set_state(value, has_ace, ncards) - Puts the hand in a given state without its cards
+        snapshot() - the hand (and any other state_attrs) as a tuple, for restore()
+        restore(state) - puts the hand back as it was at a snapshot
         payoff(winnings) - Player is paid chips or chips taken (or 0 for tie)
+        sits_at(deck) - Informs the player of the shoe the game is dealt from
         new_shoe() - Called when the deck has been reshuffled
         sees(cards) - Informs the player of any visible cards besides those she has been dealt
+        see(card) - Same as sees([card]) for one card, without the list
 
     And there are descriptive methods:
         __str__() - Shows synopsis of current hand
         title() - Descriptive heading for reports for this player
+
+    The hand is tracked as a few counters and flags updated as each card
+    arrives, so playing a hand allocates nothing. Set keep_cards to True
+    (on the class or on a player) to also keep the list of cards.
     """
+    keep_cards = False
+    state_attrs = ('value', 'has_ace', 'ncards', 'pair', '_first')   # saved by snapshot()
 
     def __init__(self):
         self.payoff(0.0)
 
     def __str__(self):
-        return 'Bj[{}]{}{}'.format(','.join(map(str, self.hand)), self.value,
-                                   ('or' + str(self.soft_value())
-                                    if self.value != self.soft_value() else ''))
+        cards = ','.join(map(str, self.hand)) if self.hand is not None else '{} cards'.format(self.ncards)
+        return 'Bj[{}]{}{}'.format(cards, self.value,
+                                   'or' + str(self.value + 10) if self.soft else '')
 
     def title(self):
         """Descriptive heading for reports for this player"""
@@ -52,10 +74,11 @@ class Blackjack(object):
         >>> bj.soft_value()
         20
         """
-        if self.value <= 11 and self.has_ace:
-            return self.value + 10
+        value = self.value
+        if self.has_ace and value <= 11:
+            return value + 10
         else:
-            return self.value
+            return value
 
     def dealt(self, cards):
         """Informs the player of her first two cards dealt during the deal"""
@@ -63,22 +86,70 @@ class Blackjack(object):
             self.hit(card)
 
     def hit(self, card):
-        """Card dealt in response to a 'hit' or 'double' choice"""
-        self.hand.append(card)
-        self.sees([card])
-        if card.rank == 'A':
+        """Card dealt in response to a 'hit' or 'double' choice
+        >>> bj = Blackjack()
+        >>> bj.dealt([Card('8h'), Card('8d')])
+        >>> bj.value, bj.ncards, bj.pair, bj.soft, bj.hand
+        (16, 2, True, False, None)
+        """
+        points = card.points
+        self.value += points
+        if points == 1:
             self.has_ace = True
-            self.value += 1
-        elif card.rank in ['T', 'J', 'Q', 'K']:
-            self.value += 10
-        else:
-            self.value += card.rank_value()
+        ncards = self.ncards = self.ncards + 1
+        if ncards < 3:
+            if ncards == 1:
+                self._first = card.rank
+            else:
+                self.pair = card.rank == self._first
+        if self.hand is not None:
+            self.hand.append(card)
+        self.see(card)
+
+    def set_state(self, value, has_ace, ncards):
+        """Puts the hand in a given state without its cards (e.g., to probe a strategy)
+        >>> bj = Blackjack()
+        >>> bj.set_state(11, True, 2)
+        >>> bj.has_bj(), bj.soft_value()
+        (True, 21)
+        """
+        self.value = value
+        self.has_ace = has_ace
+        self.ncards = ncards
+        self.pair = False
+        self._first = None
+        self.hand = None
+
+    def snapshot(self):
+        """The hand (and any other state_attrs) as a tuple, for restore()
+        >>> bj = Blackjack()
+        >>> bj.dealt([Card('Th'), Card('5d')])
+        >>> state = bj.snapshot()
+        >>> bj.hit(Card('9s')); bj.busted()
+        True
+        >>> bj.restore(state); bj.value, bj.ncards
+        (15, 2)
+        """
+        state = tuple([getattr(self, name) for name in self.state_attrs])
+        if self.hand is not None:
+            return state + (tuple(self.hand),)
+        return state
+
+    def restore(self, state):
+        """Puts the hand (and any other state_attrs) back as they were at a snapshot()"""
+        for name, value in zip(self.state_attrs, state):
+            setattr(self, name, value)
+        if len(state) > len(self.state_attrs):
+            self.hand = list(state[-1])
 
     def payoff(self, winnings):
         """Player is paid chips or chips taken (or 0 for tie)"""
-        self.hand = []
+        self.hand = [] if self.keep_cards else None
         self.value = 0
         self.has_ace = False
+        self.ncards = 0
+        self.pair = False
+        self._first = None
 
     def busted(self):
         """True if value > 21
@@ -104,7 +175,7 @@ class Blackjack(object):
         >>> bj.has_bj()
         True
         """
-        return len(self.hand) == 2 and self.value == 11 and self.has_ace
+        return self.ncards == 2 and self.value == 11 and self.has_ace
 
     def beats(self, other):
         """True if this hand beats the other (higher points but not busted, etc.)
@@ -147,6 +218,10 @@ class Blackjack(object):
         """Gets the bet from the player prior to the hand being played"""
         return 100  # $100
 
+    def sits_at(self, deck):
+        """Informs the player of the shoe the game is dealt from"""
+        pass
+
     def new_shoe(self):
         """Called when the deck has been reshuffled"""
         pass
@@ -155,6 +230,36 @@ class Blackjack(object):
         """Informs the player of any visible cards besides those she has been dealt"""
         pass
 
+    def see(self, card):
+        """Informs the player of one visible card, including her own as they are dealt
+        (a subclass that defines sees() but not see() gets a see() that calls its sees(),
+        even if it inherits another see())
+        >>> from CardCounter import CardCounter
+        >>> class Aces(CardCounter):
+        ...     def sees(self, cards):
+        ...         self.count += sum(card.rank == 'A' for card in cards)
+        >>> player = Aces()
+        >>> player.see(Card('As')); player.see(Card('2h'))
+        >>> player.count
+        1
+        """
+        pass
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'sees' in cls.__dict__ and 'see' not in cls.__dict__:
+            cls.see = _see_with_sees
+
+    @property
+    def soft(self):
+        """True if an Ace in the hand can count as 11"""
+        return self.has_ace and self.value <= 11
+
+
+def _see_with_sees(self, card):
+    """see() for subclasses that only override sees()"""
+    self.sees((card,))
+
 
 class Soft17(Blackjack):
     """Standard American dealer strategy"""
@@ -189,80 +294,99 @@ class Soft17(Blackjack):
 
 
 class Basic(Blackjack):
-    """Basic ideal strategy. E.g., see wikipedia for betting chart."""
-    hard_strategy = {16: 5 * 's' + 5 * 'h',
-                     15: 5 * 's' + 5 * 'h',
-                     14: 5 * 's' + 5 * 'h',
-                     13: 5 * 's' + 5 * 'h',
-                     12: 2 * 'h' + 3 * 's' + 5 * 'h',
-                     11: 10 * 'h',
-                     10: 8 * 'h' + 2 * 'h',
-                     9: 'h' + 4 * 'h' + 5 * 'h',
-                     8: 10 * 'h',
-                     7: 10 * 'h',
-                     6: 10 * 'h',
-                     5: 10 * 'h',
-                     4: 10 * 'h'}
-    hard_strategy2 = {16: 5 * 's' + 5 * 'h',
-                      15: 5 * 's' + 5 * 'h',
-                      14: 5 * 's' + 5 * 'h',
-                      13: 5 * 's' + 5 * 'h',
-                      12: 2 * 'h' + 3 * 's' + 5 * 'h',
-                      11: 10 * 'd',
-                      10: 8 * 'd' + 2 * 'h',
-                      9: 'h' + 4 * 'd' + 5 * 'h',
-                      8: 10 * 'h',
-                      7: 10 * 'h',
-                      6: 10 * 'h',
-                      5: 10 * 'h',
-                      4: 10 * 'h'}
-    soft_strategy = {10: 10 * 's',
-                     9: 4 * 's' + 's' + 5 * 's',
-                     8: 5 * 's' + 2 * 's' + 3 * 'h',
-                     7: 'h' + 4 * 'h' + 5 * 'h',
-                     6: 2 * 'h' + 3 * 'h' + 5 * 'h',
-                     5: 2 * 'h' + 3 * 'h' + 5 * 'h',
-                     4: 3 * 'h' + 2 * 'h' + 5 * 'h',
-                     3: 3 * 'h' + 2 * 'h' + 5 * 'h',
-                     2: 10 * 'h'}
-    soft_strategy2 = {10: 10 * 's',
-                      9: 4 * 's' + 'd' + 5 * 's',
-                      8: 5 * 'd' + 2 * 's' + 3 * 'h',
-                      7: 'h' + 4 * 'd' + 5 * 'h',
-                      6: 2 * 'h' + 3 * 'd' + 5 * 'h',
-                      5: 2 * 'h' + 3 * 'd' + 5 * 'h',
-                      4: 3 * 'h' + 2 * 'd' + 5 * 'h',
-                      3: 3 * 'h' + 2 * 'd' + 5 * 'h',
-                      2: 10 * 'h'}
+    """Basic ideal strategy. E.g., see wikipedia for betting chart.
+
+    The charts (hard_strategy, soft_strategy and the double-allowed
+    hard_strategy2 and soft_strategy2) are read from a chart file, by default
+    basic_strategy.csv, and compiled into table, a flat tuple of STAY, HIT or
+    DOUBLE indexed by (soft flag, total, can-double, dealer-up column).
+    """
     xlate = {'s': 'stay', 'd': 'double', 'h': 'hit'}
+    codes = {'s': STAY, 'h': HIT, 'd': DOUBLE}
+    chart_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'basic_strategy.csv')
+
+    @classmethod
+    def load_chart(cls, path):
+        """Read the strategy charts from a csv file (rows of chart, total and one
+        s/h/d letter per dealer up card 2-9, T, A) and compile them into cls.table
+        """
+        charts = {'hard_strategy': {}, 'hard_strategy2': {},
+                  'soft_strategy': {}, 'soft_strategy2': {}}
+        with open(path) as f:
+            lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        for line in lines[1:]:  # skip heading
+            chart, total, *row = line.split(',')
+            if chart not in charts or len(row) != len(UP_CARDS):
+                raise ValueError(line + ' is not a strategy chart row')
+            charts[chart][int(total)] = ''.join(row)
+        for chart, rows in charts.items():
+            setattr(cls, chart, rows)
+
+        table = [STAY] * (2 * TOTALS * 2 * len(UP_CARDS))  # unlisted totals stay
+        for soft, can_double, rows in ((0, 0, cls.hard_strategy), (0, 1, cls.hard_strategy2),
+                                       (1, 0, cls.soft_strategy), (1, 1, cls.soft_strategy2)):
+            for total, row in rows.items():
+                for col, letter in enumerate(row):
+                    table[Basic.index(soft, total, can_double, col)] = cls.codes[letter]
+        cls.table = tuple(table)
+        cls._table_array = None
+
+    @staticmethod
+    def index(soft, total, can_double, col):
+        """Position of a decision in the flat table"""
+        return ((soft * TOTALS + total) * 2 + can_double) * len(UP_CARDS) + col
 
     def title(self):
         """Descriptive heading for reports for this player"""
         return '$100 wager, basic strategy'
 
+    def decide(self, dlr_up):
+        """Choice as STAY, HIT or DOUBLE, looked up in the compiled table
+        >>> b = Basic()
+        >>> b.dealt([Card('5h'), Card('6d')])
+        >>> b.decide(Card('Th')) == DOUBLE
+        True
+        """
+        value = self.value
+        if value > 16 or (value == 11 and self.has_ace and self.ncards == 2):  # blackjack stays
+            return STAY
+        soft = 1 if self.has_ace and value <= 10 else 0
+        can_double = 1 if self.ncards == 2 else 0
+        return self.table[((soft * TOTALS + value) * 2 + can_double) * 10  # Basic.index, inlined
+                          + UP_COLUMN[dlr_up.ordinal]]
+
     def choose(self, dlr_up):
-        """Choice is best choice statistically for a full deck."""
-        if self.has_bj() or self.value > 16:
-            return 'stay'
+        """Choice is best choice statistically for a full deck.
+        >>> b = Basic()
+        >>> b.dealt([Card('As'), Card('7d')])
+        >>> b.choose(Card('5h')), b.choose(Card('9h'))
+        ('double', 'hit')
+        """
+        return CHOICES[self.decide(dlr_up)]
 
-        # get row from correct strategy table
-        if len(self.hand) == 2:  # allowed to double
-            if self.has_ace and self.value <= 10:
-                row = Basic.soft_strategy2[self.value]
-            else:
-                row = Basic.hard_strategy2[self.value]
-        else:  # not allowed to double
-            if self.has_ace and self.value <= 10:
-                row = Basic.soft_strategy[self.value]
-            else:
-                row = Basic.hard_strategy[self.value]
+    @classmethod
+    def decide_batch(cls, value, has_ace, ncards, up):
+        """Choices for a whole batch of hands at once, as a numpy array of STAY, HIT, DOUBLE
+        :param value:    numpy array of hand values (Ace=1)
+        :param has_ace:  numpy array, True where the hand holds an Ace
+        :param ncards:   numpy array of the number of cards in each hand
+        :param up:       numpy array of the dealer up cards' ordinals
+        >>> import numpy as np
+        >>> Basic.decide_batch(np.array([11, 11, 8, 20]), np.array([False, True, True, False]),
+        ...                    np.array([2, 2, 2, 3]), np.array([8, 8, 3, 12])).tolist()
+        [2, 0, 2, 0]
+        """
+        import numpy as np
+        if cls._table_array is None:
+            cls._table_array = np.array(cls.table, dtype=np.int8).reshape(2, TOTALS, 2, len(UP_CARDS))
+        value = np.asarray(value)
+        has_ace = np.asarray(has_ace, dtype=bool)
+        soft = (has_ace & (value <= 10)).astype(np.intp)
+        can_double = (np.asarray(ncards) == 2).astype(np.intp)
+        cols = np.asarray(UP_COLUMN, dtype=np.intp)[np.asarray(up)]
+        choices = cls._table_array[soft, np.minimum(value, TOTALS - 1), can_double, cols]
+        blackjack = has_ace & (value == 11) & (can_double == 1)
+        return np.where(blackjack | (value > 16), STAY, choices)
 
-        # get column
-        if dlr_up.rank == 'A':
-            col = 9  # last choice is for aces
-        elif dlr_up.rank_value() >= 10:
-            col = 8  # ten-point card 10, J, Q, K
-        else:
-            col = dlr_up.rank_value() - 2  # table starts out for 2, 3, ...
 
-        return Basic.xlate[row[col]]
+Basic.load_chart(Basic.chart_file)
@@ -14,8 +14,16 @@ class Card(object):
         Card.suit_order - arbitrary suit ordering for sorting (Clubs, Diamonds, Hearts, then Spades)
         Card.rank_order - also for sorting
 
+        Card.by_ordinal - the 52 cards, indexed by ordinal (the placement in a sorted deck)
+        Card.by_name - the 52 cards, keyed by two-character code (e.g., 'AS')
+
     Object Data:
         rank and suit (as one-character codes)
+        ordinal - placement in a sorted deck, 0 ('2C') to 51 ('AS')
+        points - blackjack point value (Ace=1, ten-cards=10)
+
+    Cards are interned: constructing a card returns one of the 52 shared,
+    immutable instances in Card.by_ordinal.
 
     Methods and Overloads:
         supports comparisons, various constructions, and is hashable
@@ -36,7 +44,9 @@ class Card(object):
     rank_order = {0: '2', 1: '3', 2: '4', 3: '5', 4: '6', 5: '7', 6: '8',
                   7: '9', 8: 'T', 9: 'J', 10: 'Q', 11: 'K', 12: 'A'}
 
-    def __init__(self, card):
+    __slots__ = ('rank', 'suit', 'ordinal', 'points', '_value', '_key')
+
+    def __new__(cls, card):
         """Card value is passed in a two-character string where the
         first character is one of Card.ranks.keys() and the second
         character is one of Card.suits.keys().
@@ -63,23 +73,53 @@ class Card(object):
         Can also be constructed from another Card.
         >>> Card(Card('ad'))
         Card('AD')
+
+        There is only one instance of each of the 52 cards.
+        >>> Card('as') is Card(51) is Card(Card('AS'))
+        True
         """
         if isinstance(card, Card):
-            rank = card.rank
-            suit = card.suit
-        elif isinstance(card, int):
+            return card
+        if isinstance(card, int):
             if not 0 <= card <= 51:
                 raise ValueError(str(card) + ' is not a valid ordinal card num')
-            rank = Card.rank_order[card % 13]
-            suit = Card.suit_order[card // 13]
-        else:
-            rank, suit = tuple(card.upper())
-            if suit not in Card.suits:
-                raise ValueError(suit + ' is not a card suit')
-            if rank not in Card.ranks:
-                raise ValueError(rank + ' is not a card rank')
-        self.rank = rank
-        self.suit = suit
+            return Card.by_ordinal[card]
+        found = Card.by_name.get(card)
+        if found is not None:
+            return found
+        rank, suit = tuple(card.upper())
+        if suit not in Card.suits:
+            raise ValueError(suit + ' is not a card suit')
+        if rank not in Card.ranks:
+            raise ValueError(rank + ' is not a card rank')
+        return Card.by_name[rank + suit]
+
+    @classmethod
+    def _make(cls, ordinal):
+        """Build the canonical instance for an ordinal (only used to fill Card.by_ordinal)"""
+        card = object.__new__(cls)
+        rank = Card.rank_order[ordinal % 13]
+        setattr_ = object.__setattr__
+        setattr_(card, 'rank', rank)
+        setattr_(card, 'suit', Card.suit_order[ordinal // 13])
+        setattr_(card, 'ordinal', ordinal)
+        setattr_(card, 'points', 1 if rank == 'A' else min(Card.ranks[rank], 10))
+        setattr_(card, '_value', Card.ranks[rank])
+        setattr_(card, '_key', (ordinal % 13) * 4 + ordinal // 13)  # by rank, then suit
+        return card
+
+    def __setattr__(self, name, value):
+        """Cards are shared, so they are immutable
+        >>> Card('2C').rank = 'A'
+        Traceback (most recent call last):
+            ...
+        AttributeError: Card is immutable
+        """
+        raise AttributeError('Card is immutable')
+
+    def __reduce__(self):
+        """Pickle (and copy) as the ordinal so unpickling returns the shared instance"""
+        return Card, (self.ordinal,)
 
     def __str__(self):
         """
@@ -102,7 +142,7 @@ class Card(object):
         >>> Card('3h') != Card('4h')
         True
         """
-        return self.rank == other.rank and self.suit == other.suit
+        return self.ordinal == other.ordinal
 
     def __lt__(self, other):
         """
@@ -113,19 +153,18 @@ class Card(object):
         >>> Card('TD') > Card('tc')
         True
         """
-        return (Card.ranks[self.rank] < Card.ranks[other.rank]
-                or (self.rank == other.rank and self.suit < other.suit))
+        return self._key < other._key
 
     def __le__(self, other):
         """
         >>> Card('2C') <= Card('AC')
         True
         """
-        return self == other or self < other
+        return self._key <= other._key
 
     def __hash__(self):
         """Make cards hashable (usable as a key to a dictionary). """
-        return hash(str(self))
+        return self.ordinal
 
     def name(self):
         """Return a long name for this card.
@@ -141,4 +180,8 @@ class Card(object):
         >>> Card('kd').rank_value()
         13
         """
-        return Card.ranks[self.rank]
+        return self._value
+
+
+Card.by_ordinal = tuple(Card._make(i) for i in range(52))
+Card.by_name = {str(card): card for card in Card.by_ordinal}
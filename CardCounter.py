@@ -2,56 +2,189 @@
 """Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
 
 CardCounter - class for card counting strategy using the hi-lo counting strategy to bring down the house. Inherits from Basic
+COUNT_SYSTEMS - card tags for the Hi-Lo, KO, Hi-Opt I, Hi-Opt II, Omega II and Zen counts
+RAMP - the default $10 - $1000 bet ramp
 """
 
 
+import json
+import math
+from bisect import bisect_right
 from Blackjack import Basic
+from Card import Card
+
+# tags for ranks 2, 3, 4, 5, 6, 7, 8, 9, ten-cards, Ace
+COUNT_SYSTEMS = {'hilo':   (1, 1, 1, 1, 1, 0, 0, 0, -1, -1),
+                 'ko':     (1, 1, 1, 1, 1, 1, 0, 0, -1, -1),
+                 'hiopt1': (0, 1, 1, 1, 1, 0, 0, 0, -1, 0),
+                 'hiopt2': (1, 1, 2, 2, 1, 1, 0, 0, -2, 0),
+                 'omega2': (1, 1, 2, 2, 2, 1, 0, -1, -2, 0),
+                 'zen':    (1, 1, 2, 2, 2, 1, 0, 0, -2, -1)}
+
+# (count, bet) steps: bet the last step whose count is reached (the first step below that)
+RAMP = ((0, 10), (1, 50), (2, 100), (3, 200), (4, 500), (5, 1000))
+
 
 class CardCounter(Basic):
-    """Inherits from Basic and implements card counting strategy"""
-    def __init__(self):
+    """Inherits from Basic and implements card counting strategy
+
+    Object Data:
+        count - running count of the cards seen since the last shuffle
+        weights - count tag for each card ordinal (see Card.by_ordinal)
+        ramp - (count, bet) steps used by bet()
+        ramp_on - 'running' to bet on the running count, 'true' to bet on the true count
+        deck - CardDeck being dealt from (set by sits_at), used for the true count
+               (an InfiniteDeck has no count: bets are read against a count of 0)
+    """
+    state_attrs = Basic.state_attrs + ('count', 'seen')   # the count is part of a snapshot()
+
+    def __init__(self, system='hilo', ramp=RAMP, ramp_on='running', ndecks=6):
+        """
+        :param system:   name of a count in COUNT_SYSTEMS
+        :param ramp:     (count, bet) steps in increasing count order
+        :param ramp_on:  'running' or 'true', the count the ramp is read against
+        :param ndecks:   decks per shoe, for the true count when no deck is known
+        """
+        if system not in COUNT_SYSTEMS:
+            raise ValueError(str(system) + ' is not a count system')
+        if ramp_on not in ('running', 'true'):
+            raise ValueError(str(ramp_on) + ' is not running or true')
+        tags = COUNT_SYSTEMS[system]
+        self.system = system
+        self.weights = tuple(tags[9] if card.points == 1 else tags[card.points - 2]
+                             for card in Card.by_ordinal)
+        self._weight_array = None
+        self._rank_weights = None
+        self.ramp = tuple(ramp)
+        self._thresholds = [count for count, bet in self.ramp]
+        self.ramp_on = ramp_on
+        self.ndecks = ndecks
+        self.deck = None
+        self._infinite = False
         self.count = 0
+        self.seen = 0
         self.payoff(0.0)
-        
+
+    @classmethod
+    def from_file(cls, path):
+        """CardCounter from a JSON file of constructor arguments (e.g., written by ramps.py)
+        >>> import json, os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'ramp.json')
+        >>> with open(path, 'w') as f:
+        ...     json.dump({'ramp': [[-0.5, 10], [1.5, 40]], 'ramp_on': 'true'}, f)
+        >>> cc = CardCounter.from_file(path)
+        >>> cc.ramp, [cc.bet() for cc.count in (0, 30)]
+        (((-0.5, 10), (1.5, 40)), [10, 40])
+        """
+        with open(path) as f:
+            kwargs = json.load(f)
+        kwargs['ramp'] = tuple(tuple(step) for step in kwargs.get('ramp', RAMP))
+        return cls(**kwargs)
+
     def title(self):
         """Descriptive heading for reports for this player"""
-        return 'CardCounter strategy, bets range between $10 - $1000'
-    
+        return 'CardCounter strategy, {} count, bets range between ${} - ${}'.format(
+            self.system, self.ramp[0][1], self.ramp[-1][1])
+
+    def sits_at(self, deck):
+        """Remembers the shoe, so the true count can use deck.undealt()
+        An infinite shoe is never reshuffled and the odds never change, so the
+        running count there means nothing and bets are read against a count of 0
+        >>> from CardDeck import InfiniteDeck
+        >>> cc = CardCounter()
+        >>> cc.sits_at(InfiniteDeck())
+        >>> cc.sees([Card('2h')] * 20)
+        >>> cc.count, cc.bet()
+        (20, 10)
+        """
+        self.deck = deck
+        self._infinite = deck is not None and deck.undealt() == math.inf
+
     def new_shoe(self):
         """When the deck is reshuffled, player sets their mental count back to 0"""
         self.count = 0
-    
+        self.seen = 0
+
     def sees(self, cards):
         """Informs the player of any visible cards besides those she has been dealt
-        player keeps mental count of cards according to rank value
+        player keeps mental count of cards according to the count system's tags
+        cards may be Card objects or a numpy array of card ordinals
+        >>> cc = CardCounter()
+        >>> cc.sees([Card('2h'), Card('Td'), Card('As'), Card('Kc'), Card('7d')])
+        >>> cc.count
+        -2
+        >>> import numpy as np
+        >>> cc.sees(np.array([0, 1, 2, 3, 4, 5]))  # 2C through 7C
+        >>> cc.count
+        3
         """
+        if hasattr(cards, 'dtype'):
+            if self._weight_array is None:
+                import numpy as np
+                self._weight_array = np.array(self.weights)
+            self.count += int(self._weight_array[cards].sum())
+            self.seen += cards.size
+            return
+        weights = self.weights
         for card in cards:
-            card_count = 0
-            card_rank = card.rank_value()   # taken from Basic
-            if card_rank in [2, 3, 4, 5, 6]:
-                card_count += 1 
-            elif card_rank in ['T', 'J', 'Q', 'K', 'A']:
-                card_count -= 1
-                
-            self.count += card_count
-        
+            self.count += weights[card.ordinal]
+            self.seen += 1
+
+    def see(self, card):
+        """Counts one card (as sees([card]), without the list)"""
+        self.count += self.weights[card.ordinal]
+        self.seen += 1
+
+    def true_count(self):
+        """Running count per deck left in the shoe (from the deck if known,
+        otherwise estimated from the cards seen)
+        >>> cc = CardCounter(ndecks=2)
+        >>> cc.sees([Card('2h'), Card('3d'), Card('8c'), Card('9c')] * 13)
+        >>> cc.count, cc.true_count()
+        (26, 26.0)
+        """
+        if self.deck is not None:
+            undealt = self.deck.undealt()
+        else:
+            undealt = 52 * self.ndecks - self.seen
+        return self.count * 52 / max(undealt, 1)
+
+    def exact_count(self):
+        """Running count of every card dealt from the deck since the shuffle, seen or not
+        (e.g., the dealer's hole card), from the deck's remaining cards per rank rather
+        than a scan; a measure of what a perfect count would be, for comparing with count.
+        Needs the deck (see sits_at), holding whole decks.
+        >>> from CardDeck import CardDeck
+        >>> cc, deck = CardCounter(), CardDeck(1)
+        >>> cc.sits_at(deck)
+        >>> cc.sees([deck.deal(), deck.deal()])   # AD, KD
+        >>> hole = deck.deal()                    # QD, not seen
+        >>> cc.count, cc.exact_count()
+        (-2, -3)
+        """
+        if self._rank_weights is None:
+            from CardDeck import RANK_INDEX
+            weights = [0] * 13
+            for card in Card.by_ordinal:
+                weights[RANK_INDEX[card.ordinal]] = self.weights[card.ordinal]
+            self._rank_weights = weights
+            self._full_count = sum(weights) * 4   # count of a whole deck (0 for balanced systems)
+        remaining = self.deck.remaining
+        left = sum(w * n for w, n in zip(self._rank_weights, remaining))
+        decks = self.deck.count() / 52
+        return round(self._full_count * decks) - left
+
     def bet(self):
         """Makes bet according to the mental count
         Lower counts return lower bets, higher counts return higher bets
-        Bets set according to provided guidance"""
-        
-        count = self.count
-            
-        if count <= 0:
-            return 10
-        elif count == 1:
-            return 50
-        elif count == 2:
-            return 100
-        elif count == 3:
-            return 200
-        elif count == 4:
-            return 500
-        elif count >= 5:
-            return 1000
-        
+        Bets set according to the ramp, read against the running or true count
+        >>> cc = CardCounter()
+        >>> [cc.bet() for cc.count in (-3, 0, 1, 4, 9)]
+        [10, 10, 50, 500, 1000]
+        """
+        if self.ramp_on == 'true':
+            count = self.true_count()
+        else:
+            count = 0 if self._infinite else self.count
+        step = bisect_right(self._thresholds, count) - 1
+        return self.ramp[max(step, 0)][1]
@@ -4,42 +4,107 @@
 CardDeck - class for a deck (or several decks) of standard playing cards for card games.
 deal() - take off the top card (and return it)
 deal_random() - take an undealt card from a random spot in the deck
+take(card) - deal a particular card from the undealt cards
+load(shoe) - deal from a recorded shoe, in its order, instead of a shuffle
+snapshot(), restore(state) - save and go back to a point in the deal
 shuffle() - replace any dealt cards and randomize the deck's order
 count() - total number of cards (52*n)
 dealt() - number of cards that have been dealt since last shuffle
 undealt() - number of cards that have yet to be dealt
+shoe_stream(n, k) - pre-generate k shuffled shoes as one integer array
+remaining - undealt cards of each rank, as an array.array (a numpy view with np.frombuffer)
+
+InfiniteDeck - a shoe of infinitely many decks: cards are drawn with replacement
 """
 
 
+import math
 import random
+from array import array
 from Card import Card
 
+RANKS = '23456789TJQKA'    # order of the ranks in CardDeck.remaining
+RANK_INDEX = tuple(card.ordinal % 13 for card in Card.by_ordinal)   # place in RANKS, by ordinal
+
+
+def _uses_numpy(rng):
+    """True for a numpy Generator, False for the random module or a random.Random
+    >>> import numpy as np
+    >>> _uses_numpy(np.random.default_rng(1)), _uses_numpy(random.Random(1))
+    (True, False)
+    >>> _uses_numpy(np.random.RandomState(1))
+    Traceback (most recent call last):
+    ...
+    TypeError: a numpy RandomState has no integers(); use numpy.random.default_rng()
+    """
+    if hasattr(rng, 'integers'):
+        return True
+    if hasattr(rng, 'permutation'):   # numpy's legacy RandomState: neither kind of rng
+        raise TypeError('a numpy RandomState has no integers(); use numpy.random.default_rng()')
+    return False
+
+
 class CardDeck(object):
     """A standard 52-card deck of playing cards (or several of them)
     
     Object Data:
         cards - list of Card objects
         top - index of last card dealt (undealt cards have index < deck.top)
+        rng - random number source (random module, random.Random or numpy Generator)
+        shoes - pre-generated shoes (in deal order) that shuffle() steps through, or None
+        shoe - number of shoes taken from shoes so far
+        remaining - undealt cards of each rank (in RANKS order), as an array.array('i')
+
+    remaining is kept up to date without slowing deal() down: deal() only
+    moves top, and the cards it dealt are taken off the counts the next time
+    remaining is read (or before anything reorders the undealt cards), so
+    every deal costs O(1) once, and a shuffle resets the counts in O(13).
     
     Methods:
-        CardDeck(n) - new deck with 52*n cards (n defaults to 1)
+        CardDeck(n, rng, shoes) - new deck with 52*n cards (n defaults to 1)
         shuffle() - replace any dealt cards and randomize the deck's order
         deal() - take off the top card (and return it)
         deal_random() - take an undealt card from a random spot in the deck
+        take(card) - deal a particular card from the undealt cards
+        load(shoe) - deal from a recorded shoe, in its order, instead of a shuffle
+        snapshot() - the current point in the deck and undealt order, for restore()
+        restore(state) - put back every card dealt since the snapshot
         count() - total number of cards (52*n)
         dealt() - number of cards that have been dealt since last shuffle
         undealt() - number of cards that have yet to be dealt
+        shoe_stream(n, k, rng) - pre-generate k shuffled shoes as one integer array
+    >>> deck = CardDeck(8, rng=random.Random(4))
+    >>> deck.shuffle()
+    >>> dealt = [deck.deal() for i in range(100)]
+    >>> tens = sum(card.points == 10 for card in deck.cards[:deck.top])
+    >>> sum(deck.remaining[8:12]) == tens, sum(deck.remaining) == deck.undealt()
+    (True, True)
+    >>> import numpy as np
+    >>> np.frombuffer(deck.remaining, dtype=np.int32).sum()   # a view, not a copy
+    np.int64(316)
     """
+    one_deck = [Card(rank + suit) for suit in Card.suits for rank in Card.ranks]
     
-    def __init__(self, num_decks=1):
+    def __init__(self, num_decks=1, rng=None, shoes=None):
         """Starts as sorted deck of undealt cards
+        :param num_decks: number of 52-card decks in the shoe
+        :param rng:       random.Random or numpy Generator for shuffling (global random if None)
+        :param shoes:     rows of card ordinals in deal order, e.g., from shoe_stream();
+                          each shuffle() then moves on to the next row instead of shuffling
+        >>> deck = CardDeck(1, shoes=[[51, 0] + list(range(1, 51))])
+        >>> deck.shuffle()
+        >>> deck.deal(), deck.deal(), deck.undealt()
+        (Card('AS'), Card('2C'), 50)
         """
-        self.cards = []
-        for i in range(num_decks):
-            for suit in Card.suits: 
-                for rank in Card.ranks:
-                    self.cards.append(Card(rank + suit)) # append card objects to self.cards
+        self.cards = CardDeck.one_deck * num_decks # shared Card objects, so no parsing or copying
         self.top = len(self.cards) # top is the index of the last dealt card
+        self.rng = random if rng is None else rng
+        self._numpy = _uses_numpy(self.rng) # numpy Generator rather than random
+        self.shoes = shoes
+        self.shoe = 0
+        self._full = array('i', [4 * num_decks]) * 13   # counts when nothing is dealt
+        self._remaining = array('i', self._full)
+        self._synced = self.top                       # top when _remaining was last brought up to date
         
     def __str__(self):
         """The list of cards from bottom of the deck to top followed by
@@ -64,7 +129,7 @@ class CardDeck(object):
         None is returned if there are no more cards.
         (Note: you can reset the deck with the shuffle method.)
         """
-        if self.top == -1: # need to assess the 0th card so assess at -1
+        if self.top == 0: # the 0th card is the last one to deal
             return None
         self.top -= 1
         return self.cards[self.top]
@@ -84,24 +149,237 @@ class CardDeck(object):
         """
         return len(self.cards)
     
+    @property
+    def remaining(self):
+        """undealt cards of each rank, in RANKS order ('2' first, 'A' last), as an array.array('i')
+        It is the same array every time, so np.frombuffer(deck.remaining, dtype=np.int32)
+        is a live view of it; read deck.remaining again after dealing to bring it up to date.
+        >>> deck = CardDeck(1)
+        >>> deck.take(Card('AS')), deck.deal(), deck.deal()
+        (Card('AS'), Card('KD'), Card('QD'))
+        >>> deck.remaining.tolist()
+        [4, 4, 4, 4, 4, 4, 4, 4, 4, 4, 3, 3, 3]
+        """
+        self._sync()
+        return self._remaining
+
+    def _sync(self):
+        """take the cards dealt since the last sync off the counts (or add back those
+        restored); between syncs top is the only thing that changes, so these are
+        exactly the cards between top and where it was"""
+        top, synced = self.top, self._synced
+        if top != synced:
+            remaining, rank = self._remaining, RANK_INDEX
+            if top < synced:
+                for card in self.cards[top:synced]:
+                    remaining[rank[card.ordinal]] -= 1
+            else:
+                for card in self.cards[synced:top]:
+                    remaining[rank[card.ordinal]] += 1
+            self._synced = top
+
+    def _reset_remaining(self):
+        """every card is undealt again"""
+        self._remaining[:] = self._full
+        self._synced = self.top
+
     def deal_random(self):
         """Deal a card selected randomly from the undealt cards.
         """   
         if self.top == 0:
             return None
-        pick = random.randint(0, self.top - 1)
+        if self.top != self._synced:
+            self._sync()   # before the undealt cards are reordered
+        if self._numpy:
+            pick = int(self.rng.integers(self.top))
+        else:
+            pick = self.rng.randrange(self.top)
         # swap picked card with top card
         self.top -= 1
         self.cards[pick], self.cards[self.top] = self.cards[self.top], self.cards[pick]
 
         return self.cards[self.top]
          
+    def take(self, card):
+        """Deal a particular card, moving it from wherever it is among the undealt cards
+        >>> deck = CardDeck(1)
+        >>> deck.take(Card('7h')), deck.undealt(), Card('7h') in deck.cards[:deck.top]
+        (Card('7H'), 51, False)
+        """
+        pick = self.cards.index(card, 0, self.top)   # ValueError if it has been dealt
+        if self.top != self._synced:
+            self._sync()   # before the undealt cards are reordered
+        self.top -= 1
+        self.cards[pick], self.cards[self.top] = self.cards[self.top], self.cards[pick]
+        return card
+
+    def load(self, shoe):
+        """Replace the cards with a recorded shoe, all undealt, to be dealt in its order
+        :param shoe: card ordinals (see Card.by_ordinal) in deal order, e.g., from shoes.load_shoes()
+        >>> deck = CardDeck(0)
+        >>> deck.load([51, 0, 12])
+        >>> deck.deal(), deck.deal(), deck.undealt(), deck.count()
+        (Card('AS'), Card('2C'), 1, 3)
+        """
+        if hasattr(shoe, 'tolist'):
+            shoe = shoe.tolist()
+        self.cards = [Card.by_ordinal[i] for i in reversed(shoe)]   # deal() takes from the end
+        self.top = len(self.cards)
+        self._full = array('i', [0]) * 13
+        for card in self.cards:
+            self._full[RANK_INDEX[card.ordinal]] += 1
+        self._reset_remaining()
+
+    def snapshot(self):
+        """The current point in the deck, to go back to with restore()
+        deal_random() and take() reorder the undealt cards, so their order is
+        saved too: after a restore the same draws deal the same cards. That
+        copies every undealt card and the rank counts, O(undealt) per snapshot.
+        """
+        self._sync()
+        return self.top, tuple(self.cards[:self.top]), array('i', self._remaining)
+
+    def restore(self, state):
+        """Put back every card dealt since snapshot() returned state, in the order
+        they were in then (not across a shuffle())
+        >>> deck = CardDeck(1, rng=random.Random(2))
+        >>> state = deck.snapshot()
+        >>> hand = [deck.deal_random() for i in range(5)]
+        >>> deck.restore(state)
+        >>> deck.undealt(), sorted(deck.cards[:deck.top]) == sorted(CardDeck(1).cards)
+        (52, True)
+        >>> deck.rng = random.Random(7)
+        >>> first = [deck.deal_random() for i in range(5)]
+        >>> deck.restore(state)
+        >>> deck.rng = random.Random(7)
+        >>> first == [deck.deal_random() for i in range(5)]   # same draws, same cards
+        True
+        """
+        top, undealt, remaining = state
+        self.cards[:top] = undealt
+        self.top = self._synced = top
+        self._remaining[:] = remaining
+
     def shuffle(self):
         """Randomly reorder the deck and reset it to be all undealt
+        The whole deck is reordered with a single permutation from the rng,
+        or, when the deck was given shoes, the next pre-generated shoe is used.
+        >>> deck = CardDeck(2, rng=random.Random(1))
+        >>> deck.shuffle()
+        >>> sorted(deck.cards) == sorted(CardDeck(2).cards), deck.undealt()
+        (True, 104)
         """
-        self.top = len(self.cards) # refill empty deck with a fresh one
-        card = self.deal_random()
-        while card is not None: # if there are undealt cards
-            card = self.deal_random() # keep dealing random cards
-        self.top = len(self.cards) # reset the deck when we run out
-    
\ No newline at end of file
+        if self.shoes is not None:
+            if self.shoe >= len(self.shoes):
+                raise IndexError('no more shoes in the stream')
+            row = self.shoes[self.shoe]
+            self.shoe += 1
+            if hasattr(row, 'tolist'):
+                row = row.tolist()
+            # only the shoe in play is made into Cards, written over the cards in place
+            self.cards[:] = map(Card.by_ordinal.__getitem__, reversed(row))   # deal() takes from the end
+            full = array('i', [0]) * 13
+            for i in row:
+                full[RANK_INDEX[i]] += 1
+            self._full = full
+        elif self._numpy:
+            cards = self.cards
+            cards[:] = [cards[i] for i in self.rng.permutation(len(cards)).tolist()]
+        else:
+            self.rng.shuffle(self.cards)
+        self.top = len(self.cards) # reset the deck to all undealt
+        self._reset_remaining()
+
+    @staticmethod
+    def shoe_stream(num_decks, k, rng=None):
+        """Pre-generate k shuffled shoes as one contiguous (k, 52*num_decks) array
+        of card ordinals (see Card.by_ordinal), each row in deal order.
+        :param rng: numpy Generator or seed
+        >>> shoes = CardDeck.shoe_stream(6, 3, rng=1)
+        >>> shoes.shape, sorted(shoes[2].tolist()) == sorted(list(range(52)) * 6)
+        ((3, 312), True)
+        """
+        import numpy as np
+        rng = np.random.default_rng(rng)
+        shoes = np.tile(np.arange(52, dtype=np.int8), (k, num_decks))
+        return rng.permuted(shoes, axis=1, out=shoes)
+    
+
+class InfiniteDeck(object):
+    """A shoe of infinitely many decks: every card is drawn with replacement, so
+    the odds never change and there is nothing to shuffle or keep track of
+
+    Cards are drawn a block at a time (one call to the rng per block) and
+    handed out by deal(). It has CardDeck's dealing methods, so simulate() and
+    the strategies play from it unchanged (see simulate(ndecks=None)); it never
+    runs out, and undealt() and count() are infinite, so it is never past its
+    penetration and a true count is always 0.
+
+    Object Data:
+        cards - the rest of the current block of drawn cards (dealt from the end)
+        rng - random number source (random module, random.Random or numpy Generator)
+        block - cards drawn at a time
+    >>> deck = InfiniteDeck(rng=random.Random(1))
+    >>> cards = [deck.deal() for i in range(52 * 1000)]
+    >>> round(sum(card.points == 10 for card in cards) / len(cards), 2)   # 4/13
+    0.31
+    >>> deck.dealt(), deck.undealt(), deck.dealt() / deck.count() > 0.7
+    (0, inf, False)
+    """
+
+    def __init__(self, rng=None, block=4096):
+        """
+        :param rng:    random.Random or numpy Generator to draw cards with (global random if None)
+        :param block:  cards drawn at a time
+        """
+        self.rng = random if rng is None else rng
+        self._numpy = _uses_numpy(self.rng)
+        self.block = block
+        self.cards = []
+
+    def __repr__(self):
+        return 'InfiniteDeck()'
+
+    def _draw(self):
+        """draw the next block of cards"""
+        if self._numpy:
+            by_ordinal = Card.by_ordinal
+            self.cards = [by_ordinal[i] for i in self.rng.integers(0, 52, self.block).tolist()]
+        else:
+            self.cards = self.rng.choices(Card.by_ordinal, k=self.block)
+
+    def deal(self):
+        """Draw a card (with replacement)"""
+        cards = self.cards
+        if not cards:
+            self._draw()
+            cards = self.cards
+        return cards.pop()
+
+    deal_random = deal
+
+    def take(self, card):
+        """Deal a particular card (which leaves the odds as they were)"""
+        return card
+
+    def snapshot(self):
+        """Nothing changes as cards are dealt, so there is nothing to save"""
+        return None
+
+    def restore(self, state):
+        """Nothing to put back (see snapshot())"""
+
+    def shuffle(self):
+        """Nothing to shuffle: the odds are the same for every card"""
+
+    def undealt(self):
+        """Cards left to deal: infinitely many"""
+        return math.inf
+
+    def dealt(self):
+        """Cards taken out of the shoe: none, since each is drawn with replacement"""
+        return 0
+
+    def count(self):
+        """Total number of cards: infinitely many"""
+        return math.inf
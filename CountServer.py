@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+CountServer - asyncio server keeping a live CardCounter for every table on a casino floor
+CountClient - asyncio client for a CountServer
+load_test(tables) - latency of a local server with many tables updating at once
+
+The protocol is JSON lines over TCP or a Unix socket. Each request line is a
+message, or a JSON array of messages answered by an array of replies, and
+every message gets one reply, in order. A message names its table and an op:
+
+    {"table": "t7", "op": "reset"}                      new shoe (optional "ndecks")
+    {"table": "t7", "op": "see", "cards": ["AS", 21]}   cards seen, as codes or ordinals
+    {"table": "t7", "op": "true_count"}                 the table's running and true counts
+    {"table": "t7", "op": "bet"}                        CardCounter.bet() at the table's count
+    {"op": "choose", "hand": ["T", "6"], "up": "T"}     Basic.choose() for a hand (ranks or codes)
+
+Replies to see, true_count and bet carry the table's count and true_count;
+bet adds the bet and choose the choice. A bad message gets {"error": ...}.
+A table's counter is created on its first message.
+
+Usage:
+    python CountServer.py --port 8765
+    python CountServer.py --unix /tmp/count.sock
+    python CountServer.py --load-test 300
+"""
+
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from Blackjack import Basic
+from Card import Card
+from CardCounter import CardCounter, RAMP
+
+
+class CountServer(object):
+    """Keeps an independent CardCounter per table id and answers count, bet and
+    strategy queries for them
+
+    Object Data:
+        tables - CardCounter for each table id
+        system, ramp, ramp_on, ndecks - settings for new tables' counters
+
+    Methods:
+        handle(message) - reply to one message (as a dict)
+        respond(line) - reply to one request line (as a JSON line)
+        start(port, path) - start serving, returning the asyncio server
+    >>> server = CountServer()
+    >>> server.handle({'table': 1, 'op': 'see', 'cards': ['2h', '5d', 'Ts', 4, 16]})
+    {'count': 3, 'true_count': 0.50814332247557}
+    >>> server.handle({'table': 1, 'op': 'bet'})['bet'], server.handle({'table': 2, 'op': 'bet'})['bet']
+    (10, 10)
+    >>> server.handle({'op': 'choose', 'hand': ['A', '7'], 'up': '5'})
+    {'choice': 'double'}
+    >>> server.handle({'table': 1, 'op': 'see', 'cards': ['XX']})
+    {'error': 'X is not a card suit'}
+    >>> server.handle({'table': 1, 'op': 'see', 'cards': [None, 3.5]})
+    {'error': 'not a card: null'}
+    >>> server.handle({'op': 'choose', 'hand': ['A', 3.5], 'up': '5'})
+    {'error': 'not a card: 3.5'}
+    >>> server.handle({'table': 1, 'op': 'reset', 'ndecks': '6'})
+    {'error': 'ndecks must be a positive integer, not "6"'}
+    >>> server.handle({'table': 1, 'op': 'reset', 'ndecks': 0})
+    {'error': 'ndecks must be a positive integer, not 0'}
+    >>> server.handle({'table': 1, 'op': 'bet'})   # the table kept its count and its 6 decks
+    {'count': 3, 'true_count': 0.50814332247557, 'bet': 10}
+    """
+
+    def __init__(self, system='hilo', ramp=RAMP, ramp_on='true', ndecks=6):
+        """
+        :param system:   count system for every table (see CardCounter.COUNT_SYSTEMS)
+        :param ramp:     (count, bet) steps for every table's bets
+        :param ramp_on:  'running' or 'true', the count the ramp is read against ('true' by
+                         default here, where CardCounter defaults to 'running': a floor's
+                         tables may deal shoes of any size, and a true count bets the same
+                         edge at each of them)
+        :param ndecks:   decks per shoe at a new table (a reset can change it)
+        """
+        CardCounter(system, ramp, ramp_on, ndecks)   # check the settings up front
+        self.system = system
+        self.ramp = ramp
+        self.ramp_on = ramp_on
+        self.ndecks = ndecks
+        self.tables = {}
+        self._hand = Basic()
+
+    def counter(self, table):
+        """the table's CardCounter, created on first use"""
+        counter = self.tables.get(table)
+        if counter is None:
+            counter = self.tables[table] = CardCounter(self.system, self.ramp, self.ramp_on, self.ndecks)
+        return counter
+
+    def handle(self, message):
+        """reply to one message
+        :param message:  dict with 'op' and (except for choose) 'table'
+        :return: reply dict
+        """
+        try:
+            op = message['op']
+            if op == 'choose':
+                hand = self._hand
+                hand.payoff(0)
+                hand.dealt([self._card(card) for card in message['hand']])
+                return {'choice': hand.choose(self._card(message['up']))}
+            counter = self.counter(message['table'])
+            if op == 'see':
+                counter.sees([self._card(card, ranks=False) for card in message['cards']])
+            elif op == 'reset':
+                ndecks = message.get('ndecks', counter.ndecks)
+                if type(ndecks) is not int or ndecks < 1:
+                    raise ValueError('ndecks must be a positive integer, not ' + json.dumps(ndecks))
+                counter.new_shoe()
+                counter.ndecks = ndecks
+            elif op != 'true_count' and op != 'bet':
+                raise ValueError(str(op) + ' is not an op')
+            reply = {'count': counter.count, 'true_count': counter.true_count()}
+            if op == 'bet':
+                reply['bet'] = counter.bet()
+            return reply
+        except KeyError as e:
+            return {'error': 'missing ' + str(e)}
+        except (TypeError, ValueError) as e:   # bad values get an error reply, never a dropped connection
+            return {'error': str(e) or type(e).__name__}
+
+    @staticmethod
+    def _card(card, ranks=True):
+        """a Card from a code, an ordinal or (if ranks) just a rank"""
+        if isinstance(card, str):
+            if ranks and len(card) == 1:
+                card += 'S'
+        elif type(card) is not int:
+            raise ValueError('not a card: ' + json.dumps(card))
+        return Card(card)
+
+    def respond(self, line):
+        """reply to one request line: a message or a JSON array of them
+        :return: the reply as a JSON line (bytes)
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            reply = {'error': 'not JSON'}
+        else:
+            if isinstance(request, list):
+                reply = [self._handle_any(message) for message in request]
+            else:
+                reply = self._handle_any(request)
+        return json.dumps(reply).encode() + b'\n'
+
+    def _handle_any(self, message):
+        if not isinstance(message, dict):
+            return {'error': 'a message must be a JSON object'}
+        return self.handle(message)
+
+    async def _serve(self, reader, writer):
+        """answer one connection's requests until it closes"""
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b'\n')
+                except asyncio.IncompleteReadError as e:   # the connection closed
+                    line = e.partial
+                except asyncio.LimitOverrunError as e:
+                    await self._skip_line(reader, e.consumed)
+                    writer.write(json.dumps({'error': 'line too long'}).encode() + b'\n')
+                    await writer.drain()
+                    continue
+                if not line:
+                    break
+                writer.write(self.respond(line))
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _skip_line(reader, consumed):
+        """discard the rest of a line longer than the reader's limit
+        :param consumed:  bytes of it in the reader's buffer (LimitOverrunError.consumed)
+        """
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b'\n')
+                return
+            except asyncio.IncompleteReadError:
+                return
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+
+    async def start(self, port=0, path=None, host='127.0.0.1'):
+        """start serving on a local TCP port, or a Unix socket if path is given
+        :param port:  TCP port (0 for any free port, see server.sockets[0].getsockname())
+        :param path:  Unix socket path
+        :return: the asyncio.Server (close() it to stop)
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve, path=path)
+        return await asyncio.start_server(self._serve, host=host, port=port)
+
+
+class CountClient(object):
+    """asyncio client for a CountServer: one connection, one request at a time
+    >>> async def session():
+    ...     server = await CountServer(ndecks=1).start()
+    ...     client = await CountClient.connect(port=server.sockets[0].getsockname()[1])
+    ...     replies = [await client.ask({'table': 'a', 'op': 'see', 'cards': ['2h', '3h', '4h', '5h']}),
+    ...                await client.ask([{'table': 'a', 'op': 'bet'}, {'table': 'a', 'op': 'reset'}])]
+    ...     await client.close()
+    ...     server.close()
+    ...     await server.wait_closed()
+    ...     return replies
+    >>> asyncio.run(session())
+    [{'count': 4, 'true_count': 4.333333333333333}, [{'count': 4, 'true_count': 4.333333333333333, 'bet': 500}, {'count': 0, 'true_count': 0.0}]]
+
+    A line longer than the stream limit (64 KiB) gets an error reply, and the
+    connection carries on with the next line:
+    >>> async def long_line():
+    ...     server = await CountServer().start()
+    ...     client = await CountClient.connect(port=server.sockets[0].getsockname()[1])
+    ...     replies = [await client.ask({'table': 'a', 'op': 'see', 'cards': ['2h'] * 50000}),
+    ...                await client.ask({'table': 'a', 'op': 'see', 'cards': ['2h']})]
+    ...     await client.close()
+    ...     server.close()
+    ...     await server.wait_closed()
+    ...     return replies
+    >>> asyncio.run(long_line())
+    [{'error': 'line too long'}, {'count': 1, 'true_count': 0.16720257234726688}]
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port=None, path=None, host='127.0.0.1'):
+        """connect to a server's TCP port, or its Unix socket if path is given"""
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def ask(self, message):
+        """send a message (or a list of them) and wait for the reply"""
+        self.writer.write(json.dumps(message).encode() + b'\n')
+        return json.loads(await self.reader.readline())
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def _load_test(tables, rounds, cards, interval, path):
+    server = await CountServer().start(path=path)
+    port = None if path else server.sockets[0].getsockname()[1]
+    clients = [await CountClient.connect(port, path) for table in range(tables)]
+    latencies = []
+
+    async def play(table, client):
+        shoe = [(table * 7 + i * 13) % 52 for i in range(cards)]
+        rng = random.Random(table)
+        await client.ask({'table': table, 'op': 'reset'})
+        for i in range(rounds):
+            await asyncio.sleep(rng.uniform(0, 2 * interval))   # tables deal out of step
+            for message in ({'table': table, 'op': 'see', 'cards': shoe},
+                            {'table': table, 'op': 'bet'},
+                            {'op': 'choose', 'hand': ['T', '6'], 'up': 'T'}):
+                began = time.perf_counter()
+                await client.ask(message)
+                latencies.append(time.perf_counter() - began)
+
+    await asyncio.gather(*(play(table, client) for table, client in enumerate(clients)))
+    for client in clients:
+        await client.close()
+    server.close()
+    await server.wait_closed()
+    return latencies
+
+
+def load_test(tables=300, rounds=20, cards=12, interval=0.1, path=None):
+    """time requests from many tables at once, each on its own connection to a local server
+    (the clients run in the same process, so they load the event loop too)
+    :param tables:    tables (and connections) updating concurrently
+    :param rounds:    rounds per table, each a see of cards cards, a bet and a choose
+    :param cards:     cards seen per round
+    :param interval:  mean seconds between a table's rounds (0 to send as fast as possible)
+    :param path:    Unix socket path (local TCP if None)
+    :return: dict of latency quantiles (p50, p90, p99, max) in seconds and requests per second
+    """
+    began = time.perf_counter()
+    latencies = sorted(asyncio.run(_load_test(tables, rounds, cards, interval, path)))
+    elapsed = time.perf_counter() - began
+    n = len(latencies)
+    result = {name: latencies[min(int(q * n), n - 1)]
+              for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))}
+    result['max'] = latencies[-1]
+    result['rate'] = n / elapsed
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--port', type=int, default=8765, help='local TCP port to serve on')
+    parser.add_argument('--host', default='127.0.0.1', help='address to serve on')
+    parser.add_argument('--unix', help='serve on this Unix socket instead of TCP')
+    parser.add_argument('--system', default='hilo', help='count system for every table')
+    parser.add_argument('--ramp-on', default='true', choices=('running', 'true'),
+                        help='count the bet ramp is read against')
+    parser.add_argument('--ndecks', type=int, default=6, help='decks per shoe at a new table')
+    parser.add_argument('--load-test', type=int, metavar='TABLES',
+                        help='instead of serving, time this many tables against a local server')
+    parser.add_argument('--interval', type=float, default=0.1,
+                        help='mean seconds between rounds at each table in the load test')
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        result = load_test(args.load_test, interval=args.interval, path=args.unix)
+        print('{} tables: {:,.0f} requests/s, p50 {:.3f} ms, p90 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms'
+              .format(args.load_test, result['rate'],
+                      *(1000 * result[name] for name in ('p50', 'p90', 'p99', 'max'))))
+        return 0
+
+    async def serve():
+        server = CountServer(args.system, ramp_on=args.ramp_on, ndecks=args.ndecks)
+        async with await server.start(args.port, args.unix, args.host) as running:
+            await running.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+EVSolver - exact composition-dependent expected values for the game in p1_blackjack
+LRUCache - bounded memo table with least-recently-used eviction
+composition(deck) - undealt cards of a CardDeck as counts per point value
+
+A composition is a tuple of 10 counts of undealt cards: index 0 for Aces,
+then 2, 3, ..., 9, and index 9 for all ten-cards (T, J, Q, K).
+"""
+
+
+from collections import OrderedDict
+
+DEALER_TOTALS = (17, 18, 19, 20, 21)     # dealer's standing totals, then bust
+
+
+def composition(deck):
+    """undealt cards of a CardDeck as counts per point value
+    >>> from CardDeck import CardDeck
+    >>> composition(CardDeck(2))
+    (8, 8, 8, 8, 8, 8, 8, 8, 8, 32)
+    >>> deck = CardDeck(1)
+    >>> deck.deal(), composition(deck)
+    (Card('AD'), (3, 4, 4, 4, 4, 4, 4, 4, 4, 16))
+    """
+    r = deck.remaining   # per rank, '2' to 'A' (see CardDeck.RANKS), kept up to date by the deck
+    return (r[12], r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8] + r[9] + r[10] + r[11])
+
+
+def _points(card):
+    """point value (Ace=1) of a Card or of a point value"""
+    return card if isinstance(card, int) else card.points
+
+
+def _remove(comp, points):
+    """composition with one card of the given point value taken out"""
+    return comp[:points - 1] + (comp[points - 1] - 1,) + comp[points:]
+
+
+class LRUCache(object):
+    """Bounded memo table: once full, the least recently used entry is evicted
+
+    Object Data:
+        maxsize - most entries kept
+        hits, misses - lookup statistics
+    >>> cache = LRUCache(2)
+    >>> cache.put('a', 1); cache.put('b', 2); cache.get('a'); cache.put('c', 3)
+    1
+    >>> cache.get('b') is None, len(cache)
+    (True, 2)
+    """
+
+    def __init__(self, maxsize=1_000_000):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key):
+        """Cached value for key (None if not cached), marking it recently used"""
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Cache value for key, evicting the least recently used entry if full"""
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        """Forget everything"""
+        self.data.clear()
+
+
+class EVSolver(object):
+    """Composition-dependent expected values, per unit bet, for the remaining shoe
+
+    The dealer plays the Soft17 rules (hits soft 17). Player EVs are for hands
+    that go on past the blackjack check, so they are conditioned on the dealer
+    not holding a blackjack. As in simulate(), a busted player pushes when the
+    dealer busts too (unless bust_push is False). The dealer's hole card is
+    drawn after the player's cards, the usual simplification.
+
+    With exact=True the dealer's outcomes are recomputed for every card the
+    player might draw. That is exact, but can take seconds for low totals
+    against small up cards. By default the dealer's outcomes come from the
+    composition at the decision, and only the player's draws deplete the
+    shoe, which is accurate to a few thousandths and takes milliseconds.
+
+    Methods:
+        dealer_distribution(comp, up) - dealer's final totals for an up card
+        stay_ev(comp, total, has_ace, up) - EV of standing
+        hit_ev(comp, total, has_ace, up) - EV of hitting (then playing on optimally)
+        double_ev(comp, total, has_ace, up) - EV of doubling
+        evaluate(comp, total, has_ace, up, ncards) - EVs of every allowed choice
+    """
+
+    def __init__(self, maxsize=1_000_000, bust_push=True, exact=False):
+        """
+        :param maxsize:    most memoized results kept (least recently used are evicted)
+        :param bust_push:  True if a busted player pushes against a busted dealer (as in simulate)
+        :param exact:      True to recompute the dealer's outcomes after each player draw
+        """
+        self.cache = LRUCache(maxsize)
+        self.bust_push = bust_push
+        self.exact = exact
+
+    def _dealer(self, comp, total, has_ace):
+        """probabilities of the dealer ending on 17..21 or busting from a hand (Ace=1)"""
+        if total > 21:
+            return (0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+        if total > 16:
+            return tuple(1.0 if total == final else 0.0 for final in DEALER_TOTALS) + (0.0,)
+        if has_ace and 7 < total < 12:  # soft 18 to 21 stands, soft 17 hits
+            return tuple(1.0 if total + 10 == final else 0.0 for final in DEALER_TOTALS) + (0.0,)
+        key = ('dealer', comp, total, has_ace)
+        found = self.cache.get(key)
+        if found is not None:
+            return found
+        left = sum(comp)
+        dist = [0.0] * 6
+        for points, n in enumerate(comp, 1):
+            if n:
+                sub = self._dealer(_remove(comp, points), total + points, has_ace or points == 1)
+                for i in range(6):
+                    dist[i] += n / left * sub[i]
+        dist = tuple(dist)
+        self.cache.put(key, dist)
+        return dist
+
+    def dealer_distribution(self, comp, up):
+        """dealer's final totals for an up card, drawing the hole card and hits from comp
+        :param comp:  composition (see module doc) of undealt cards, not including up
+        :param up:    dealer's up card (Card or point value)
+        :return: dict of probabilities keyed by 17..21, 'bust' and 'blackjack'
+        >>> d = EVSolver().dealer_distribution((4,) * 9 + (16,), 6)
+        >>> round(d['bust'], 3), d['blackjack']
+        (0.439, 0.0)
+        """
+        up = _points(up)
+        left = sum(comp)
+        dist = dict.fromkeys(DEALER_TOTALS + ('bust', 'blackjack'), 0.0)
+        for points, n in enumerate(comp, 1):
+            if not n:
+                continue
+            if up + points == 11 and 1 in (up, points):
+                dist['blackjack'] += n / left
+                continue
+            sub = self._dealer(_remove(comp, points), up + points, up == 1 or points == 1)
+            for final, p in zip(DEALER_TOTALS + ('bust',), sub):
+                dist[final] += n / left * p
+        return dist
+
+    def _dealer_no_bj(self, comp, up):
+        """dealer's (17, 18, 19, 20, 21, bust) probabilities given no dealer blackjack"""
+        key = ('no_bj', comp, up)
+        found = self.cache.get(key)
+        if found is not None:
+            return found
+        dist = self.dealer_distribution(comp, up)
+        live = 1.0 - dist['blackjack']
+        found = tuple(dist[final] / live for final in DEALER_TOTALS + ('bust',))
+        self.cache.put(key, found)
+        return found
+
+    def _stay(self, dealer_comp, total, has_ace, up):
+        """EV of standing (or of a bust) against a dealer drawing from dealer_comp"""
+        dist = self._dealer_no_bj(dealer_comp, up)
+        if total > 21:
+            return -1.0 if not self.bust_push else -(1.0 - dist[5])
+        soft = total + 10 if has_ace and total < 12 else total
+        ev = dist[5]
+        for final, p in zip(DEALER_TOTALS, dist):
+            if soft > final:
+                ev += p
+            elif soft < final:
+                ev -= p
+        return ev
+
+    def _hit(self, comp, dealer_comp, total, has_ace, up):
+        """EV of taking a card from comp, then standing or hitting, whichever is better"""
+        key = ('hit', comp, dealer_comp, total, has_ace, up)
+        found = self.cache.get(key)
+        if found is not None:
+            return found
+        left = sum(comp)
+        ev = 0.0
+        for points, n in enumerate(comp, 1):
+            if n:
+                rest = _remove(comp, points)
+                after = rest if self.exact else dealer_comp
+                new_total, new_ace = total + points, has_ace or points == 1
+                best = self._stay(after, new_total, new_ace, up)
+                if new_total < 21:
+                    best = max(best, self._hit(rest, after, new_total, new_ace, up))
+                ev += n / left * best
+        self.cache.put(key, ev)
+        return ev
+
+    def stay_ev(self, comp, total, has_ace, up):
+        """EV of standing on a hand (total counts an Ace as 1)
+        >>> round(EVSolver().stay_ev((4,) * 9 + (16,), 20, False, 10), 3)
+        0.555
+        """
+        return self._stay(comp, total, has_ace, _points(up))
+
+    def hit_ev(self, comp, total, has_ace, up):
+        """EV of taking a card, then standing or hitting again, whichever is better
+        >>> comp = (24,) * 9 + (96,)
+        >>> fast, exact = EVSolver().hit_ev(comp, 16, False, 10), EVSolver(exact=True).hit_ev(comp, 16, False, 10)
+        >>> abs(fast - exact) < 0.005
+        True
+        """
+        return self._hit(comp, comp, total, has_ace, _points(up))
+
+    def double_ev(self, comp, total, has_ace, up):
+        """EV of doubling the bet and taking exactly one more card"""
+        up = _points(up)
+        left = sum(comp)
+        ev = 0.0
+        for points, n in enumerate(comp, 1):
+            if n:
+                rest = _remove(comp, points)
+                ev += n / left * self._stay(rest if self.exact else comp, total + points,
+                                            has_ace or points == 1, up)
+        return 2 * ev
+
+    def evaluate(self, comp, total, has_ace, up, ncards=2):
+        """EVs of each allowed choice for a player hand
+        :param comp:     composition (see module doc) of undealt cards
+        :param total:    hand value, counting any Ace as 1
+        :param has_ace:  True if the hand holds an Ace
+        :param up:       dealer's up card (Card or point value)
+        :param ncards:   cards in the hand (doubling is only allowed on two)
+        :return: dict of EVs keyed by 'stay', 'hit' and (for two cards) 'double'
+        >>> evs = EVSolver().evaluate((24,) * 9 + (96,), 11, False, 6)
+        >>> max(evs, key=evs.get)
+        'double'
+        """
+        evs = {'stay': self.stay_ev(comp, total, has_ace, up),
+               'hit': self.hit_ev(comp, total, has_ace, up)}
+        if ncards == 2:
+            evs['double'] = self.double_ev(comp, total, has_ace, up)
+        return evs
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+EventLog - fixed-width binary log of every hand simulate() plays, written in batches
+read_log(path) - memory-map a log as a numpy structured array (no parsing, no copying)
+by_true_count(events) - hands, mean bet and mean winnings per unit bet for each true count
+
+A log file is a short header (magic, header length, and the record dtype as
+JSON) padded to 64 bytes, then one fixed-width record per hand. Records are
+only ever appended, so the record count is read from the file size, and a
+file cut short by a crash loses at most the partial last record.
+
+Card fields hold card ordinals (see Card.by_ordinal), decisions hold STAY,
+HIT or DOUBLE (see Blackjack.CHOICES), and unused slots hold -1.
+"""
+
+
+import json
+import os
+import numpy as np
+
+MAGIC = b'BJEVLOG1'
+HEADER = 64                  # header is padded to a multiple of this
+MAX_CARDS = 12               # card and decision slots per hand (longer hands are truncated)
+DTYPE = np.dtype([('evening', '<u4'),              # simulate() call, counting from 0
+                  ('hand', '<u4'),                 # hand within the evening
+                  ('bet', '<f4'),                  # final bet (doubled if the player doubled)
+                  ('payoff', '<f4'),               # player's winnings for the hand
+                  ('count', '<i2'),                # player's running count at bet time (0 if none)
+                  ('true_count', '<f4'),           # player's true count at bet time (nan if none)
+                  ('undealt', '<u2'),              # undealt cards at bet time (UNDEALT_MAX if more)
+                  ('player_cards', 'u1'),          # cards in the player's hand
+                  ('dealer_cards', 'u1'),          # cards in the dealer's hand
+                  ('player_total', 'u1'),          # player's final soft value
+                  ('dealer_total', 'u1'),          # dealer's final soft value
+                  ('player', 'i1', (MAX_CARDS,)),  # player's cards in deal order
+                  ('dealer', 'i1', (MAX_CARDS,)),  # dealer's cards (hole card, up card, hits)
+                  ('decisions', 'i1', (MAX_CARDS,))])
+PAD = (-1,) * MAX_CARDS
+UNDEALT_MAX = 65535            # undealt is capped here (e.g., for an InfiniteDeck)
+
+
+class EventLog(object):
+    """Writes a record for every hand to a binary log file, a batch at a time
+
+    Pass one to simulate(log=...); it calls start_evening() at the start of
+    each evening and record() as each hand is settled. Close it (or use it
+    as a context manager) to write the last batch.
+    >>> import random, tempfile
+    >>> from Blackjack import Basic
+    >>> from p1_blackjack import simulate
+    >>> path = os.path.join(tempfile.mkdtemp(), 'hands.bjlog')
+    >>> with EventLog(path) as log:
+    ...     for seed in range(3):
+    ...         final, lo, hi = simulate(Basic(), hands=50, rng=random.Random(seed), log=log)
+    >>> events = read_log(path)
+    >>> len(events), int(events['evening'].max()), float(events['payoff'][-50:].sum()) == final
+    (150, 2, True)
+    """
+
+    def __init__(self, path, batch=65536, append=False):
+        """
+        :param path:    log file to write
+        :param batch:   records buffered before each write
+        :param append:  True to add to an existing log (its evenings keep counting up)
+        """
+        self.batch = batch
+        self.rows = []
+        self.evening = -1
+        self.hand = 0
+        if append and os.path.exists(path):
+            existing = read_log(path)
+            if existing.dtype != DTYPE:
+                raise ValueError(path + ' has an older record layout; start a new log')
+            self.evening = int(existing['evening'][-1]) if len(existing) else -1
+            del existing
+            self.file = open(path, 'ab')
+        else:
+            self.file = open(path, 'wb')
+            header = MAGIC + json.dumps({'dtype': DTYPE.descr}).encode()
+            length = -(-(len(header) + 4) // HEADER) * HEADER
+            self.file.write(MAGIC + length.to_bytes(4, 'little') + header[len(MAGIC):])
+            self.file.write(b' ' * (length - len(header) - 4))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start_evening(self):
+        """Start numbering hands for a new evening"""
+        self.evening += 1
+        self.hand = 0
+
+    def record(self, bet, payoff, count, true_count, undealt, player, dealer, decisions,
+               player_total, dealer_total):
+        """Add one hand's record (player, dealer and decisions are lists of small ints)"""
+        self.rows.append((self.evening, self.hand, bet, payoff, count, true_count, min(undealt, UNDEALT_MAX),
+                          len(player), len(dealer), player_total, dealer_total,
+                          (tuple(player) + PAD)[:MAX_CARDS], (tuple(dealer) + PAD)[:MAX_CARDS],
+                          (tuple(decisions) + PAD)[:MAX_CARDS]))
+        self.hand += 1
+        if len(self.rows) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records"""
+        if self.rows:
+            self.file.write(np.array(self.rows, dtype=DTYPE).tobytes())
+            self.rows = []
+        self.file.flush()
+
+    def close(self):
+        """Write the buffered records and close the file"""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_log(path):
+    """memory-map a log written by EventLog as a read-only numpy structured array
+    Columns are views (events['bet'], events['player'][:, 0], ...), so scans over
+    billions of hands read the file directly without parsing or loading it.
+    """
+    with open(path, 'rb') as f:
+        start = f.read(len(MAGIC) + 4)
+        if start[:len(MAGIC)] != MAGIC:
+            raise ValueError(path + ' is not an EventLog file')
+        length = int.from_bytes(start[len(MAGIC):], 'little')
+        header = json.loads(f.read(length - len(start)).decode())
+    dtype = np.dtype([tuple(field) for field in header['dtype']])
+    records = (os.path.getsize(path) - length) // dtype.itemsize
+    if records == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=length, shape=(records,))
+
+
+def by_true_count(events, lo=-10, hi=10):
+    """hands, mean bet and mean winnings per unit bet for each true count (rounded)
+    :param events:  records from read_log() (or any slice of them)
+    :param lo, hi:  true counts beyond these are lumped in with them
+    :return: (true counts, hands, mean bet, mean winnings per unit bet) as numpy arrays
+    >>> events = np.zeros(4, dtype=DTYPE)
+    >>> events['true_count'] = [0.2, -0.3, 1.4, 2.6]
+    >>> events['bet'], events['payoff'] = [10, 10, 50, 100], [10, -10, 75, -100]
+    >>> tc, n, bet, ev = by_true_count(events, -1, 3)
+    >>> tc.tolist(), n.tolist(), ev.tolist()
+    ([-1, 0, 1, 2, 3], [0, 2, 1, 0, 1], [0.0, 0.0, 1.5, 0.0, -1.0])
+    """
+    tc = np.clip(np.rint(np.nan_to_num(events['true_count'])), lo, hi).astype(np.intp) - lo
+    size = hi - lo + 1
+    n = np.bincount(tc, minlength=size)
+    bets = np.bincount(tc, weights=events['bet'], minlength=size)
+    won = np.bincount(tc, weights=events['payoff'], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_bet = np.where(n > 0, bets / n, 0.0)
+        ev = np.where(bets > 0, won / bets, 0.0)
+    return np.arange(lo, hi + 1), n, mean_bet, ev
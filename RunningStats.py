@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Constant-memory statistics for large trial counts
+
+RunningStats - Welford mean/variance with min, max and streaming quantiles (mergeable moments)
+P2Quantile - P-squared streaming estimate of one quantile
+Histogram - sparse fixed-width histogram, mergeable and re-binnable for plotting
+"""
+
+
+import math
+
+
+class RunningStats(object):
+    """Count, mean, variance, min and max of a stream, in constant memory
+
+    Object Data:
+        n, mean - count and mean so far
+        min, max - extremes so far
+        estimators - P2Quantile for each requested quantile
+    >>> stats = RunningStats(quantiles=(0.5,))
+    >>> for x in (2, 4, 4, 4, 5, 5, 7, 9): stats.add(x)
+    >>> stats.n, stats.mean, stats.stdev(), stats.min, stats.max, round(stats.quantile(0.5), 2)
+    (8, 5.0, 2.0, 2, 9, 4.17)
+    """
+
+    def __init__(self, quantiles=()):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.estimators = {q: P2Quantile(q) for q in quantiles}
+
+    def add(self, x):
+        """Add one observation"""
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        for estimator in self.estimators.values():
+            estimator.add(x)
+
+    def variance(self, ddof=0):
+        """Population variance (ddof=0, as np.var) or sample variance (ddof=1)"""
+        return self._m2 / (self.n - ddof) if self.n > ddof else math.nan
+
+    def stdev(self, ddof=0):
+        """Population standard deviation (ddof=0, as np.std) or sample (ddof=1)"""
+        return math.sqrt(self.variance(ddof))
+
+    def sem(self):
+        """Standard error of the mean"""
+        return self.stdev(1) / math.sqrt(self.n) if self.n > 1 else math.inf
+
+    def quantile(self, q):
+        """Streaming estimate of a quantile requested when this was created"""
+        return self.estimators[q].value()
+
+    def merge(self, other):
+        """Combine another RunningStats' moments and extremes into this one
+        (quantile estimates cannot be merged; use a Histogram for those)
+        >>> a, b, both = RunningStats(), RunningStats(), RunningStats()
+        >>> for x in (1, 2, 3): a.add(x); both.add(x)
+        >>> for x in (10, 20): b.add(x); both.add(x)
+        >>> a.merge(b)
+        >>> (a.n, a.mean, round(a.variance(), 9), a.max) == (both.n, both.mean, round(both.variance(), 9), both.max)
+        True
+        """
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.n * other.n / n
+        self.mean += delta * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.estimators = {}
+
+    def to_dict(self):
+        """Moments and extremes as a JSON-ready dict"""
+        return {'n': self.n, 'mean': self.mean, 'm2': self._m2, 'min': self.min, 'max': self.max}
+
+    @staticmethod
+    def from_dict(data):
+        """RunningStats from to_dict() output"""
+        stats = RunningStats()
+        stats.n, stats.mean, stats._m2 = data['n'], data['mean'], data['m2']
+        stats.min, stats.max = data['min'], data['max']
+        return stats
+
+
+class P2Quantile(object):
+    """Streaming estimate of one quantile in constant memory (Jain and Chlamtac's
+    P-squared algorithm: five markers moved with piecewise-parabolic interpolation)
+    >>> import random
+    >>> rng = random.Random(1)
+    >>> median = P2Quantile(0.5)
+    >>> for i in range(20000): median.add(rng.random())
+    >>> abs(median.value() - 0.5) < 0.01
+    True
+    """
+
+    def __init__(self, q):
+        self.q = q
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x):
+        """Add one observation"""
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(x)
+            heights.sort()
+            return
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+        positions = self.positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        for i in (1, 2, 3):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (d <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if d > 0 else -1
+                h = self._parabolic(i, d)
+                if not heights[i - 1] < h < heights[i + 1]:
+                    h = heights[i] + d * (heights[i + d] - heights[i]) / (positions[i + d] - positions[i])
+                heights[i] = h
+                positions[i] += d
+
+    def _parabolic(self, i, d):
+        """piecewise-parabolic prediction of marker i's height moved by d"""
+        n, h = self.positions, self.heights
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        """Current estimate (exact, by interpolation, for fewer than five observations)"""
+        heights = self.heights
+        if not heights:
+            return math.nan
+        if len(heights) < 5:
+            position = self.q * (len(heights) - 1)
+            below = int(position)
+            above = min(below + 1, len(heights) - 1)
+            return heights[below] + (heights[above] - heights[below]) * (position - below)
+        return heights[2]
+
+
+class Histogram(object):
+    """Sparse histogram with fixed-width bins aligned on multiples of width
+
+    Bins are only stored once something lands in them, so the range never
+    has to be known in advance. Histograms with the same width merge by
+    adding counts, and rebin() coarsens them to a handful of bars for plotting.
+    >>> h = Histogram(10)
+    >>> for x in (-5, 3, 7, 12, 31): h.add(x)
+    >>> h.total, h.counts[0], h.quantile(0.5)
+    (5, 2, 7.5)
+    >>> h.rebin(2)
+    ([-30, 0, 30, 60], [1, 3, 1])
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.counts = {}
+        self.total = 0
+
+    def add(self, x, n=1):
+        """Count n observations of x"""
+        key = math.floor(x / self.width)
+        self.counts[key] = self.counts.get(key, 0) + n
+        self.total += n
+
+    def merge(self, other):
+        """Add another Histogram (of the same width) into this one"""
+        if other.width != self.width:
+            raise ValueError('cannot merge histograms with widths {} and {}'.format(self.width, other.width))
+        for key, n in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + n
+        self.total += other.total
+
+    def quantile(self, q):
+        """Quantile, interpolated within its bin"""
+        target = q * self.total
+        seen = 0
+        for key in sorted(self.counts):
+            n = self.counts[key]
+            if seen + n >= target:
+                return (key + (target - seen) / n) * self.width
+            seen += n
+        return math.nan
+
+    def rebin(self, bins=20):
+        """Coarsen to about the given number of bins over the observed range
+        :return: (edges, counts) with len(edges) == len(counts) + 1
+        """
+        if not self.counts:
+            return [], []
+        first, last = min(self.counts), max(self.counts)
+        factor = max(1, math.ceil((last - first + 1) / bins))
+        start = first - first % factor
+        coarse = [0] * ((last - start) // factor + 1)
+        for key, n in self.counts.items():
+            coarse[(key - start) // factor] += n
+        edges = [(start + i * factor) * self.width for i in range(len(coarse) + 1)]
+        return edges, coarse
+
+    def to_dict(self):
+        """Width and counts as a JSON-ready dict"""
+        return {'width': self.width, 'counts': {str(key): n for key, n in self.counts.items()}}
+
+    @staticmethod
+    def from_dict(data):
+        """Histogram from to_dict() output"""
+        histogram = Histogram(data['width'])
+        for key, n in data['counts'].items():
+            histogram.counts[int(key)] = n
+            histogram.total += n
+        return histogram
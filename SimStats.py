@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+SimStats - per-phase counters, nanosecond timers and hooks for simulate()
+"""
+
+
+from time import perf_counter_ns
+
+
+class SimStats(object):
+    """Per-phase instrumentation for simulate(stats=SimStats())
+
+    simulate() calls lap(phase) as it finishes each phase of a hand, which
+    adds the nanoseconds since the previous lap to that phase's timer.
+
+    Phases:
+        shuffle - penetration checks and reshuffles (counted per reshuffle)
+        deal - bets and the deal to the player, the other seats and the dealer
+        decision - the player's choices (counted per choice)
+        dealer - dealer play (counted per hand the dealer plays out)
+        settle - blackjack checks and payoffs (counted per hand)
+
+    Hooks (any may be None):
+        on_shuffle(deck) - after each reshuffle
+        on_deal(player, dealer_up) - after the deal
+        on_decision(player, choice) - after each of the player's choices
+        on_payoff(amount) - as each hand is settled
+    >>> stats = SimStats()
+    >>> stats.start(); stats.lap('deal'); stats.lap('settle')
+    >>> stats.counts['deal'], stats.counts['settle'], stats.ns['deal'] >= 0
+    (1, 1, True)
+    """
+    PHASES = ('shuffle', 'deal', 'decision', 'dealer', 'settle')
+
+    def __init__(self, on_shuffle=None, on_deal=None, on_decision=None, on_payoff=None):
+        self.counts = dict.fromkeys(SimStats.PHASES, 0)
+        self.ns = dict.fromkeys(SimStats.PHASES, 0)
+        self.on_shuffle = on_shuffle
+        self.on_deal = on_deal
+        self.on_decision = on_decision
+        self.on_payoff = on_payoff
+        self._last = 0
+
+    def __str__(self):
+        total = sum(self.ns.values()) or 1
+        lines = ['{:10s}{:>10s}{:>14s}{:>8s}'.format('phase', 'count', 'ms', '%')]
+        for phase in SimStats.PHASES:
+            lines.append('{:10s}{:10d}{:14.3f}{:8.1%}'.format(
+                phase, self.counts[phase], self.ns[phase] / 1e6, self.ns[phase] / total))
+        return '\n'.join(lines)
+
+    def start(self):
+        """Start the clock for the first phase"""
+        self._last = perf_counter_ns()
+
+    def lap(self, phase, n=1):
+        """Charge the time since the last lap to phase and count n events for it"""
+        now = perf_counter_ns()
+        self.ns[phase] += now - self._last
+        self.counts[phase] += n
+        self._last = now
+
+    def merge(self, other):
+        """Add another SimStats' counters and timers into this one"""
+        for phase in SimStats.PHASES:
+            self.counts[phase] += other.counts[phase]
+            self.ns[phase] += other.ns[phase]
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Table - a blackjack table where every seat is a simulated player, dealt from one shared shoe
+"""
+
+
+from Blackjack import Soft17
+from CardDeck import CardDeck
+
+
+class Table(object):
+    """A blackjack table: every seat is a Blackjack object that plays its own
+    hand, in seat order, from the shared CardDeck
+
+    Cards are dealt as at a real table: one to each seat and the dealer, then
+    a second round. Every seat sees the other seats' cards, the dealer's up
+    card, all hit cards, and the dealer's hole card once it is turned over
+    (unless the round ends on a blackjack check). Settlement follows simulate():
+    blackjacks pay 3:2, the dealer always plays out, and a busted seat pushes
+    against a busted dealer.
+
+    Object Data:
+        seats - players in seat order (each must be a distinct object)
+        dealer - Blackjack object playing the dealer
+        deck - the shared CardDeck
+        penetration - depth of shoe before reshuffling
+        final, lo, hi - each seat's accumulated winnings and their watermarks
+
+    Methods:
+        play_round() - play one hand at every seat, returning each seat's winnings
+        play(hands) - play a number of rounds, returning each seat's (final, lo, hi)
+    >>> import random
+    >>> from Blackjack import Blackjack, Basic
+    >>> from CardCounter import CardCounter
+    >>> table = Table([Basic(), CardCounter(), Blackjack()], rng=random.Random(1))
+    >>> results = table.play(100)
+    >>> len(results), all(lo <= final <= hi for final, lo, hi in results)
+    (3, True)
+    """
+
+    def __init__(self, seats, dealer=None, ndecks=6, penetration=0.7, rng=None, shoes=None):
+        """
+        :param seats:        Blackjack objects, one per seat, in the order they play
+        :param dealer:       Blackjack object representing the dealer (a new Soft17 if None)
+        :param ndecks:       Number of decks in each shoe
+        :param penetration:  Depth of shoe before reshuffling
+        :param rng:          random.Random or numpy Generator for shuffling (global random if None)
+        :param shoes:        pre-generated shoes to play through (see CardDeck.shoe_stream)
+        """
+        self.seats = list(seats)
+        if len(set(map(id, self.seats))) != len(self.seats):
+            raise ValueError('each seat needs its own player object')
+        self.dealer = Soft17() if dealer is None else dealer
+        self.deck = CardDeck(ndecks, rng, shoes)
+        self.deck.shuffle()
+        self.penetration = penetration
+        for seat in self.seats:
+            seat.sits_at(self.deck)
+        self.final = [0] * len(self.seats)
+        self.lo = [0] * len(self.seats)
+        self.hi = [0] * len(self.seats)
+
+    def _show(self, card, but=None):
+        """every seat (except the seat numbered but) sees the card"""
+        for i, seat in enumerate(self.seats):
+            if i != but:
+                seat.see(card)
+
+    def play_round(self):
+        """play one hand at every seat and settle it
+        :return: list of each seat's winnings for the round
+        """
+        deck, seats, dealer = self.deck, self.seats, self.dealer
+        if deck.dealt() / deck.count() > self.penetration:
+            deck.shuffle()
+            for seat in seats:
+                seat.new_shoe()
+
+        bets = [seat.bet() for seat in seats]
+
+        # one card to each seat, then the dealer, twice round the table
+        first = [deck.deal() for seat in seats]
+        dealer_up = deck.deal()
+        second = [deck.deal() for seat in seats]
+        dealer_hole = deck.deal()
+        dealer.dealt([dealer_hole, dealer_up])   # up card last, as in simulate()
+        for i, seat in enumerate(seats):
+            seat.dealt([first[i], second[i]])
+        for i, seat in enumerate(seats):
+            seat.sees(first[:i] + first[i + 1:] + second[:i] + second[i + 1:] + [dealer_up])
+
+        # if the dealer has blackjack, the round ends: only seats with blackjack push
+        if dealer.has_bj():
+            amounts = [0.0 if seat.has_bj() else -bet for seat, bet in zip(seats, bets)]
+            return self._settle(amounts)
+
+        # seats play in order; everyone sees their hit cards
+        amounts = [None] * len(seats)
+        for i, seat in enumerate(seats):
+            if seat.has_bj():
+                amounts[i] = bets[i] * 1.5
+                continue
+            action = seat.choose(dealer_up)
+            while action != 'stay' and not seat.busted():
+                action = seat.choose(dealer_up)
+                if action == 'hit' or action == 'double':
+                    card = deck.deal()
+                    seat.hit(card)
+                    self._show(card, but=i)
+                    if action == 'double':
+                        bets[i] += bets[i]
+                        break
+
+        # dealer turns over the hole card and plays out (as in simulate(), even if every seat busted)
+        self._show(dealer_hole)
+        while dealer.choose(dealer_up) == 'hit' and not dealer.busted():
+            card = deck.deal()
+            dealer.hit(card)
+            self._show(card)
+
+        for i, seat in enumerate(seats):
+            if amounts[i] is None:
+                if seat.beats(dealer):
+                    amounts[i] = bets[i]
+                elif dealer.beats(seat):
+                    amounts[i] = -bets[i]
+                else:
+                    amounts[i] = 0
+        return self._settle(amounts)
+
+    def _settle(self, amounts):
+        """pay off every seat and the dealer, and track each seat's winnings"""
+        for i, (seat, amount) in enumerate(zip(self.seats, amounts)):
+            seat.payoff(amount)
+            self.final[i] += amount
+            if self.final[i] < self.lo[i]:
+                self.lo[i] = self.final[i]
+            elif self.final[i] > self.hi[i]:
+                self.hi[i] = self.final[i]
+        self.dealer.payoff(-sum(amounts))
+        return amounts
+
+    def play(self, hands=100):
+        """play a number of rounds at the table
+        :param hands:  rounds to play
+        :return: list of (final, lo, hi), each seat's accumulated winnings (as simulate())
+        """
+        for hand in range(hands):
+            self.play_round()
+        return list(zip(self.final, self.lo, self.hi))
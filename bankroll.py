@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Bankroll sizing: risk of ruin, drawdowns, time to double and N0, by vectorized Monte Carlo
+
+hand_distribution(events, ramp) - winnings per hand, as (amounts, probabilities), from logged hands
+risk_of_ruin(amounts, probabilities, bankroll, hands) - simulate many bankroll paths at once
+n0(amounts, probabilities) - hands for the expected win to reach one standard deviation
+
+Per-hand payoffs come from an EventLog (see EventLog.read_log): for each true
+count, how often it comes up and the distribution of winnings per unit bet.
+Bets can be re-read off a bet ramp, so one log serves any ramp. Hands are then
+drawn independently from that distribution (the true count's run within a
+shoe is not modelled), a block of hands at a time for every path at once.
+"""
+
+
+import numpy as np
+from bisect import bisect_right
+
+
+def hand_distribution(events, ramp=None, lo=-10, hi=10):
+    """winnings per hand as a discrete distribution
+    :param events:  hand records from EventLog.read_log()
+    :param ramp:    (true count, bet) steps, as CardCounter's ramp read against the true count,
+                    or None to keep the bets in the log
+    :param lo, hi:  true counts beyond these are lumped in with them
+    :return: (amounts, probabilities) arrays, one entry per distinct winnings
+    >>> from EventLog import DTYPE
+    >>> events = np.zeros(4, dtype=DTYPE)
+    >>> events['true_count'] = [0, 0, 2, 2]
+    >>> events['bet'], events['payoff'] = [10, 20, 10, 10], [10, -20, -10, 15]
+    >>> events['decisions'] = -1
+    >>> events['decisions'][1, 0] = 2       # the second hand doubled a $10 bet
+    >>> amounts, p = hand_distribution(events, ramp=((0, 10), (2, 100)))
+    >>> amounts.tolist(), p.tolist()
+    ([-100.0, -20.0, 10.0, 150.0], [0.25, 0.25, 0.25, 0.25])
+    """
+    doubled = np.any(events['decisions'] == 2, axis=1)
+    base = np.where(doubled, events['bet'] / 2, events['bet']).astype(np.float64)
+    units = events['payoff'] / base          # winnings per unit of the original bet
+    if ramp is None:
+        amounts = events['payoff'].astype(np.float64)
+    else:
+        tc = np.clip(np.rint(np.nan_to_num(events['true_count'])), lo, hi).astype(np.intp)
+        counts = [count for count, bet in ramp]
+        bets = np.array([ramp[max(bisect_right(counts, t) - 1, 0)][1] for t in range(lo, hi + 1)],
+                        dtype=np.float64)
+        amounts = bets[tc - lo] * units
+    values, n = np.unique(amounts, return_counts=True)
+    return values, n / n.sum()
+
+
+def _alias_table(probabilities):
+    """Walker's alias table: column i is kept with probability prob[i], else alias[i] is used"""
+    n = len(probabilities)
+    prob = np.asarray(probabilities, dtype=np.float64) * (n / np.sum(probabilities))
+    alias = np.arange(n)
+    small = [i for i in range(n) if prob[i] < 1.0]
+    large = [i for i in range(n) if prob[i] >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        alias[less] = more
+        prob[more] -= 1.0 - prob[less]
+        (small if prob[more] < 1.0 else large).append(more)
+    prob[small + large] = 1.0   # what is left over is 1 but for rounding
+    return prob, alias
+
+
+def _simulate_group(rng, amounts, table, bankroll, hands, sessions, paths, block):
+    """bankroll paths for one group of paths
+    :return: (session each path was ruined in, or sessions if never; worst drawdown;
+              hand each path first doubled the bankroll on, or -1 if never)
+    """
+    prob, alias = table
+    n = len(amounts)
+    choices = np.concatenate((amounts, amounts[alias]))   # each column's amount, then its alias's
+    value = np.zeros(paths)          # winnings so far
+    peak = np.zeros(paths)
+    drawdown = np.zeros(paths)
+    ruined = np.zeros(paths, dtype=bool)
+    ruined_in = np.full(paths, sessions, dtype=np.int64)
+    doubled_at = np.full(paths, -1, dtype=np.int64)
+    played = 0
+    for session in range(sessions):
+        for start in range(0, hands, block):
+            size = min(block, hands - start)
+            # a row per hand, a column per path, so each step below is a contiguous vector op
+            # draw each hand's winnings by the alias method: a column, then it or its alias
+            u = rng.random((size, paths))
+            u *= n
+            column = u.astype(np.intp)
+            u -= column
+            column += n * (u >= prob.take(column))
+            path = choices.take(column)
+            path[:, ruined] = 0.0                     # ruined paths stop playing
+            path[0] += value
+            np.cumsum(path, axis=0, out=path)
+
+            # ruin is absorbing: a path stays where it went broke
+            for col in np.flatnonzero((path.min(axis=0) <= -bankroll) & ~ruined):
+                broke = int(np.argmax(path[:, col] <= -bankroll))
+                path[broke:, col] = path[broke, col]
+                ruined[col] = True
+                ruined_in[col] = session
+
+            up = path >= bankroll
+            new = (doubled_at < 0) & up.any(axis=0)
+            doubled_at[new] = played + start + up[:, new].argmax(axis=0) + 1
+            running_peak = np.maximum.accumulate(path, axis=0)
+            np.maximum(running_peak, peak, out=running_peak)
+            peak = running_peak[-1].copy()
+            value = path[-1].copy()
+            running_peak -= path
+            np.maximum(drawdown, running_peak.max(axis=0), out=drawdown)
+        played += hands
+    return ruined_in, drawdown, doubled_at
+
+
+def n0(amounts, probabilities):
+    """hands for the expected win to reach one standard deviation of the winnings (variance / EV^2)
+    >>> round(n0(np.array([-1.0, 1.0]), np.array([0.49, 0.51])))
+    2499
+    """
+    mean = float(np.dot(amounts, probabilities))
+    variance = float(np.dot((amounts - mean) ** 2, probabilities))
+    return variance / mean ** 2 if mean else np.inf
+
+
+def risk_of_ruin(amounts, probabilities, bankroll, hands, sessions=1, paths=100_000,
+                 quantiles=(0.5, 0.9, 0.99), seed=None, group=4096, block=64):
+    """simulate many bankroll paths, a block of hands at a time across a group of paths
+    :param amounts:         winnings per hand (from hand_distribution)
+    :param probabilities:   probability of each
+    :param bankroll:        starting bankroll; a path is ruined once it is all lost
+    :param hands:           hands per session
+    :param sessions:        sessions per path
+    :param paths:           bankroll paths to simulate
+    :param quantiles:       quantiles of the worst drawdown (peak to trough) to report
+    :param seed:            seed for numpy's random generator
+    :param group, block:    paths and hands simulated at once (small enough to stay in cache)
+    :return: dict with ev, sd and n0 per hand, ruin (probability of ruin over all
+             sessions), ruin_by_session (cumulative), ruin_estimate (exp(-2 ev bankroll / var),
+             the diffusion approximation for an unlimited horizon), drawdown (quantiles of
+             each path's worst drawdown), double (probability of doubling the bankroll
+             before ruin) and hands_to_double (median, over paths that doubled)
+    >>> result = risk_of_ruin(np.array([-1.0, 1.0]), np.array([0.5, 0.5]), 10, 100, paths=20000, seed=1)
+    >>> 0.2 < result['ruin'] < 0.4, result['ruin'] == result['ruin_by_session'][-1]
+    (True, True)
+    """
+    rng = np.random.default_rng(seed)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    table = _alias_table(probabilities)
+    ruined_in = np.empty(paths, dtype=np.int64)
+    drawdown = np.empty(paths)
+    doubled_at = np.empty(paths, dtype=np.int64)
+    for first in range(0, paths, group):
+        last = min(first + group, paths)
+        ruined_in[first:last], drawdown[first:last], doubled_at[first:last] = \
+            _simulate_group(rng, amounts, table, bankroll, hands, sessions, last - first, block)
+    ruin_by_session = [float(np.mean(ruined_in <= session)) for session in range(sessions)]
+
+    mean = float(np.dot(amounts, probabilities))
+    variance = float(np.dot((amounts - mean) ** 2, probabilities))
+    doubled = doubled_at[doubled_at >= 0]
+    return {'ev': mean,
+            'sd': variance ** 0.5,
+            'n0': n0(amounts, probabilities),
+            'ruin': ruin_by_session[-1],
+            'ruin_by_session': ruin_by_session,
+            'ruin_estimate': float(np.exp(-2 * mean * bankroll / variance)) if mean > 0 else 1.0,
+            'drawdown': {q: float(np.quantile(drawdown, q)) for q in quantiles},
+            'double': doubled.size / paths,
+            'hands_to_double': float(np.median(doubled)) if doubled.size else np.nan}
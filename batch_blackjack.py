@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Vectorized batch engine for p1_blackjack.simulate
+
+simulate_batch(player, trials) - play many independent evenings of blackjack at once
+decision_table(player) - compile a player's choose() into a lookup table
+count_weights(player) - compile a player's sees() into a per-ordinal table
+bet_function(player) - compile a player's bet() into a function of the count and shoe depth
+bet_table(player) - compile a player's bet() into a lookup table on the running count
+
+Every trial is a row of NumPy arrays: the shoe is a row of card ordinals
+(the same numbering as Card(n)), and each hand is tracked as a (value,
+has_ace, ncards) triple, exactly as Blackjack tracks it. Strategies are
+turned into lookup tables by probing the player object's own methods, so
+the batch engine plays the same game as simulate() for Blackjack, Soft17,
+Basic and CardCounter.
+"""
+
+
+import copy
+import numpy as np
+from Card import Card
+from Blackjack import Soft17, STAY, HIT, DOUBLE, CHOICES
+
+CODES = {choice: code for code, choice in enumerate(CHOICES)}
+
+MAX_VALUE = 31      # highest hard value a hand can be asked to choose on
+MAX_COUNT = 64      # running counts are clipped to +/- this for bet lookups
+EXHAUSTED = 'shoe exhausted; lower penetration or nplayers'   # a deal ran past a shoe's end
+
+# point value (Ace=1) and dealer up-card column (2..9, ten-card, Ace) by ordinal
+POINTS = np.array([card.points for card in Card.by_ordinal], dtype=np.int8)
+UP_COLUMN = np.where(POINTS == 1, 9, POINTS - 2).astype(np.int8)
+UP_CARDS = [Card(r + 'S') for r in '23456789TA']   # one representative per column
+
+
+def decision_table(player):
+    """compile player.choose() into table[can_double, has_ace, value, up_column]
+    holding STAY, HIT or DOUBLE
+    >>> from Blackjack import Basic
+    >>> t = decision_table(Basic())
+    >>> int(t[1, 0, 11, 0]) == DOUBLE, int(t[0, 0, 11, 0]) == HIT, int(t[0, 0, 17, 5]) == STAY
+    (True, True, True)
+    """
+    probe = copy.deepcopy(player)
+    table = np.zeros((2, 2, MAX_VALUE + 1, len(UP_CARDS)), dtype=np.int8)
+    for can_double in (0, 1):
+        for has_ace in (0, 1):
+            for value in range(2 if has_ace else 4, MAX_VALUE + 1):  # skip unreachable hands
+                for col, up in enumerate(UP_CARDS):
+                    probe.set_state(value, bool(has_ace), 2 if can_double else 3)
+                    table[can_double, has_ace, value, col] = CODES[probe.choose(up)]
+    probe.payoff(0.0)
+    return table
+
+
+def count_weights(player):
+    """compile player.sees() into the change of player.count for each card ordinal
+    (all zeros for players that do not count cards)
+    """
+    weights = np.zeros(52, dtype=np.int32)
+    if not hasattr(player, 'count'):
+        return weights
+    probe = copy.deepcopy(player)
+    for i in range(52):
+        probe.count = 0
+        probe.sees([Card(i)])
+        weights[i] = probe.count
+    return weights
+
+
+def bet_function(player):
+    """compile player.bet() into a function of (running count, undealt cards) arrays;
+    a ramp on the true count is read from the player's ramp, any other bet is probed
+    >>> from CardCounter import CardCounter
+    >>> bets = bet_function(CardCounter(ramp_on='true'))
+    >>> bets(np.array([0, 6, 6]), np.array([312, 312, 52])).tolist()
+    [10.0, 50.0, 1000.0]
+    """
+    if getattr(player, 'ramp_on', 'running') == 'true':
+        thresholds = np.array([count for count, bet in player.ramp], dtype=np.float64)
+        ramp = np.array([bet for count, bet in player.ramp], dtype=np.float64)
+        return lambda count, undealt: ramp[np.maximum(
+            np.searchsorted(thresholds, count * 52 / np.maximum(undealt, 1), side='right') - 1, 0)]
+    bets = bet_table(player)
+    return lambda count, undealt: bets[np.clip(count, -MAX_COUNT, MAX_COUNT) + MAX_COUNT]
+
+
+def bet_table(player):
+    """compile player.bet() into a table indexed by running count + MAX_COUNT"""
+    probe = copy.deepcopy(player)
+    probe.sits_at(None)   # bets at each count, whatever shoe the player last sat at
+    if not hasattr(probe, 'count'):
+        return np.full(2 * MAX_COUNT + 1, probe.bet(), dtype=np.float64)
+    bets = np.zeros(2 * MAX_COUNT + 1, dtype=np.float64)
+    for count in range(-MAX_COUNT, MAX_COUNT + 1):
+        probe.count = count
+        bets[count + MAX_COUNT] = probe.bet()
+    return bets
+
+
+def _soft_value(value, has_ace):
+    """point value, promoting any Ace to 11, if possible (see Blackjack.soft_value)"""
+    return np.where(has_ace & (value <= 11), value + 10, value)
+
+
+def _play_block(n, player_table, dealer_table, weights, bets, hands, ndecks,
+                penetration, nplayers, rng):
+    """simulate n trials at once; returns (final, lo, hi) arrays of length n
+    (ndecks None draws every card with replacement, with no shoes to keep)"""
+    infinite = ndecks is None
+    if infinite:
+        weights = np.zeros_like(weights)     # no shoe to count down: the count stays 0
+    else:
+        size = 52 * ndecks
+        shoes = np.tile(np.arange(52, dtype=np.int8), (n, ndecks))
+        rng.permuted(shoes, axis=1, out=shoes)
+    cursor = np.zeros(n, dtype=np.int64)     # number of cards dealt from each shoe
+    count = np.zeros(n, dtype=np.int64)      # player's running count
+    rows = np.arange(n)
+    final = np.zeros(n)
+    lo = np.zeros(n)
+    hi = np.zeros(n)
+    others = np.arange(2 * nplayers)
+
+    def deal(idx):
+        """deal the next card from the shoes of the trials in idx"""
+        if infinite:
+            return rng.integers(0, 52, idx.size, dtype=np.int8)
+        if cursor[idx].max() >= size:
+            raise ValueError(EXHAUSTED)
+        cards = shoes[idx, cursor[idx]]
+        cursor[idx] += 1
+        return cards
+
+    for hand in range(hands):
+        if infinite:
+            # the whole deal (player, other players, dealer) drawn in one block
+            bet = bets(count, np.inf)
+            dealt = rng.integers(0, 52, (n, 4 + 2 * nplayers), dtype=np.int8)
+            p1, p2, d1, d2 = dealt[:, 0], dealt[:, 1], dealt[:, -2], dealt[:, -1]
+            count += weights[dealt[:, :-2]].sum(axis=1) + weights[d2]
+        else:
+            # reshuffle any shoe past its penetration
+            stale = np.flatnonzero(cursor / size > penetration)
+            if stale.size:
+                shoes[stale] = rng.permuted(shoes[stale], axis=1)
+                cursor[stale] = 0
+                count[stale] = 0
+
+            bet = bets(count, size - cursor)
+            if cursor.max() + 2 * nplayers + 4 > size:   # the deal must fit in every shoe
+                raise ValueError(EXHAUSTED)
+
+            # player's two cards, the other players' cards, then the dealer's
+            p1, p2 = deal(rows), deal(rows)
+            count += weights[p1] + weights[p2]
+            if nplayers:
+                seen = shoes[rows[:, None], cursor[:, None] + others]
+                cursor += 2 * nplayers
+                count += weights[seen].sum(axis=1)
+            d1, d2 = deal(rows), deal(rows)
+            count += weights[d2]
+        up = UP_COLUMN[d2]
+
+        p_value = POINTS[p1].astype(np.int64) + POINTS[p2]
+        p_ace = (POINTS[p1] == 1) | (POINTS[p2] == 1)
+        p_cards = np.full(n, 2)
+        d_value = POINTS[d1].astype(np.int64) + POINTS[d2]
+        d_ace = (POINTS[d1] == 1) | (POINTS[d2] == 1)
+
+        # blackjacks settle immediately
+        p_bj = p_ace & (p_value == 11)
+        d_bj = d_ace & (d_value == 11)
+        amount = np.where(p_bj, np.where(d_bj, 0.0, 1.5 * bet), np.where(d_bj, -bet, 0.0))
+        live = np.flatnonzero(~(p_bj | d_bj))
+
+        # player hits until stay, bust or a double
+        idx = live
+        while idx.size:
+            idx = idx[p_value[idx] <= 21]
+            choice = player_table[(p_cards[idx] == 2).astype(np.int8), p_ace[idx].astype(np.int8),
+                                  p_value[idx], up[idx]]
+            idx = idx[choice != STAY]
+            choice = choice[choice != STAY]
+            if not idx.size:
+                break
+            bet[idx[choice == DOUBLE]] *= 2
+            card = deal(idx)
+            count[idx] += weights[card]
+            p_value[idx] += POINTS[card]
+            p_ace[idx] |= POINTS[card] == 1
+            p_cards[idx] += 1
+            idx = idx[choice == HIT]
+
+        # dealer plays out every live hand, even if the player busted
+        idx = live
+        while idx.size:
+            choice = dealer_table[0, d_ace[idx].astype(np.int8), np.minimum(d_value[idx], MAX_VALUE),
+                                  up[idx]]
+            idx = idx[(choice == HIT) & (d_value[idx] <= 21)]
+            if not idx.size:
+                break
+            card = deal(idx)
+            count[idx] += weights[card]
+            d_value[idx] += POINTS[card]
+            d_ace[idx] |= POINTS[card] == 1
+
+        # settle: a busted player loses unless the dealer also busts (a tie)
+        p_bust = p_value[live] > 21
+        d_bust = d_value[live] > 21
+        p_soft = _soft_value(p_value[live], p_ace[live])
+        d_soft = _soft_value(d_value[live], d_ace[live])
+        wins = ~p_bust & (d_bust | (p_soft > d_soft))
+        losses = ~d_bust & (p_bust | (d_soft > p_soft))
+        amount[live] = np.where(wins, bet[live], np.where(losses, -bet[live], 0.0))
+
+        final += amount
+        np.minimum(lo, final, out=lo)
+        np.maximum(hi, final, out=hi)
+
+    return final, lo, hi
+
+
+def simulate_batch(player, trials, dealer=None, hands=100, ndecks=6, penetration=0.7,
+                   nplayers=7, seed=None, block=100_000):
+    """simulate many independent evenings of blackjack as NumPy arrays
+    :param player:           Blackjack object representing the player (its strategy is compiled)
+    :param trials:           Number of independent evenings to simulate
+    :param dealer:           Blackjack object representing the dealer (Soft17 if None)
+    :param hands:            Number of hands to simulate per evening
+    :param ndecks:           Number of decks in each shoe (None to draw cards with replacement)
+    :param penetration:      Depth of shoe before reshuffling
+    :param nplayers:         Number of other players present (not simulated, but cards seen)
+    :param seed:             seed (or numpy Generator) for the shoes
+    :param block:            Number of trials played together (bounds memory use)
+    :return: (final, lo, hi) arrays with one entry per trial, as from simulate()
+    >>> from Blackjack import Basic
+    >>> final, lo, hi = simulate_batch(Basic(), 5, seed=1)
+    >>> final.shape, bool((lo <= 0).all() and (hi >= 0).all() and (lo <= final).all())
+    ((5,), True)
+    >>> bool((simulate_batch(Basic(), 5, seed=1)[0] == final).all())
+    True
+    >>> simulate_batch(Basic(), 5, ndecks=None, seed=1)[0].shape   # infinite deck
+    (5,)
+    >>> simulate_batch(Basic(), 5, ndecks=1, nplayers=30, seed=1)   # 64 cards a deal
+    Traceback (most recent call last):
+    ...
+    ValueError: shoe exhausted; lower penetration or nplayers
+    """
+    if dealer is None:
+        dealer = Soft17()
+    rng = np.random.default_rng(seed)
+    player_table = decision_table(player)
+    dealer_table = decision_table(dealer)
+    weights = count_weights(player)
+    bets = bet_function(player)
+    results = [_play_block(min(block, trials - start), player_table, dealer_table, weights,
+                           bets, hands, ndecks, penetration, nplayers, rng)
+               for start in range(0, trials, block)]
+    return tuple(np.concatenate(r) for r in zip(*results))
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Benchmark suite for the hot paths of Card, CardDeck, the strategies and simulate()
+
+run_benchmarks(names) - time each benchmark, as operations per second
+compare(results, baseline, threshold) - benchmarks that regressed past the threshold
+
+Usage:
+    python benchmarks.py                       # run and print
+    python benchmarks.py --save                # run and record as the baseline
+    python benchmarks.py --threshold 0.15      # fail if anything is 15% slower than the baseline
+"""
+
+
+import argparse
+import json
+import random
+import sys
+import timeit
+from Card import Card
+from CardDeck import CardDeck
+from Blackjack import Blackjack, Soft17, Basic
+from CardCounter import CardCounter
+from p1_blackjack import simulate
+
+BASELINE = 'benchmarks.json'
+
+
+def _card_str():
+    names = [str(card) for card in Card.by_ordinal]
+    return lambda: [Card(name) for name in names], 52
+
+
+def _card_int():
+    return lambda: [Card(i) for i in range(52)], 52
+
+
+def _card_card():
+    cards = list(Card.by_ordinal)
+    return lambda: [Card(card) for card in cards], 52
+
+
+def _card_hash():
+    cards = CardDeck(6).cards
+    return lambda: set(cards), len(cards)
+
+
+def _card_sort():
+    cards = CardDeck(6).cards
+    random.Random(0).shuffle(cards)
+    return lambda: sorted(cards), len(cards)
+
+
+def _deck_init():
+    return lambda: CardDeck(6), 1
+
+
+def _deck_shuffle():
+    deck = CardDeck(6, rng=random.Random(0))
+    return deck.shuffle, 1
+
+
+def _deck_deal():
+    deck = CardDeck(6, rng=random.Random(0))
+
+    def deal_shoe():
+        deck.top = deck.count()
+        for i in range(deck.count()):
+            deck.deal()
+    return deal_shoe, deck.count()
+
+
+def _deck_remaining():
+    deck = CardDeck(8, rng=random.Random(0))
+    deck.shuffle()
+
+    def deal_and_read():
+        deck.shuffle()
+        for hand in range(deck.count() // 20):   # read the counts about once a hand
+            for i in range(20):
+                deck.deal()
+            deck.remaining
+    return deal_and_read, deck.count()
+
+
+def _choose(player_class):
+    def setup():
+        player = player_class()
+        player.dealt([Card('5h'), Card('7d')])
+        up = Card('4s')
+        return lambda: player.choose(up), 1
+    return setup
+
+
+def _counter_sees():
+    counter = CardCounter()
+    cards = CardDeck(1).cards
+    return lambda: counter.sees(cards), len(cards)
+
+
+def _counter_bet():
+    counter = CardCounter()
+    counter.count = 3
+    return counter.bet, 1
+
+
+def _simulate(player_class, hands=100):
+    def setup():
+        rng = random.Random(0)
+        return lambda: simulate(player_class(), Soft17(), hands=hands, rng=rng), hands
+    return setup
+
+
+BENCHMARKS = {'card_from_str': _card_str,
+              'card_from_int': _card_int,
+              'card_from_card': _card_card,
+              'card_hash': _card_hash,
+              'card_sort': _card_sort,
+              'deck_init': _deck_init,
+              'deck_shuffle': _deck_shuffle,
+              'deck_deal': _deck_deal,
+              'deck_remaining': _deck_remaining,
+              'basic_choose': _choose(Basic),
+              'soft17_choose': _choose(Soft17),
+              'counter_sees': _counter_sees,
+              'counter_bet': _counter_bet,
+              'simulate_blackjack': _simulate(Blackjack),
+              'simulate_soft17': _simulate(Soft17),
+              'simulate_basic': _simulate(Basic),
+              'simulate_cardcounter': _simulate(CardCounter)}
+
+
+def run_benchmarks(names=None, seconds=0.2, repeat=5):
+    """time each benchmark, keeping the best of several repeats
+    :param names:    benchmark names (all of BENCHMARKS if None)
+    :param seconds:  rough time for each repeat
+    :param repeat:   repeats per benchmark
+    :return: dict of operations (cards, decisions, hands, ...) per second keyed by name
+    >>> sorted(run_benchmarks(['deck_init'], seconds=0.01, repeat=1))
+    ['deck_init']
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        stmt, ops = BENCHMARKS[name]()
+        timer = timeit.Timer(stmt)
+        number, elapsed = timer.autorange()
+        number = max(1, int(number * seconds / max(elapsed, 1e-9)))
+        best = min(timer.repeat(repeat=repeat, number=number))
+        results[name] = ops * number / best
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """benchmarks more than threshold (a fraction) slower than the baseline
+    :return: dict of (baseline, current) ops/sec keyed by name
+    >>> compare({'a': 80.0, 'b': 100.0}, {'a': 100.0, 'b': 100.0, 'c': 1.0}, 0.1)
+    {'a': (100.0, 80.0)}
+    """
+    return {name: (baseline[name], rate) for name, rate in results.items()
+            if name in baseline and rate < baseline[name] * (1 - threshold)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('names', nargs='*', help='benchmarks to run (default all)')
+    parser.add_argument('--baseline', default=BASELINE, help='JSON baseline file')
+    parser.add_argument('--save', action='store_true', help='record these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='fractional slowdown that counts as a regression')
+    parser.add_argument('--seconds', type=float, default=0.2, help='rough time per repeat')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names, seconds=args.seconds)
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    for name, rate in results.items():
+        change = '' if name not in baseline else '{:+7.1%}'.format(rate / baseline[name] - 1)
+        print('{:24s}{:14,.0f}/s {}'.format(name, rate, change))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for name, (before, after) in regressions.items():
+        print('REGRESSION {}: {:,.0f}/s -> {:,.0f}/s'.format(name, before, after))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Common-random-numbers comparison of strategies
+
+compare_strategies(players, trials) - play every strategy on the same shoes, hand by hand,
+and report paired differences against the first player with confidence intervals
+
+Every strategy plays each hand from the same point in one shared shoe, so
+they get the same starting cards and the same dealer hands, and shuffle
+noise cancels out of the differences. These usually need far fewer trials
+than separate visualize() runs for the same precision.
+"""
+
+
+import copy
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from Blackjack import Soft17
+from CardDeck import CardDeck
+from RunningStats import RunningStats
+from p1_blackjack import play_hand
+from trials import trial_seeds
+
+
+def _compare_evening(players, dealers, rng, hands=100, ndecks=6, penetration=0.7, nplayers=7):
+    """play one evening for every player on a shared shoe, round by round
+    every player's hand starts from the same point in the shoe; the shoe then moves on
+    past the deepest of them, so cards only some players drew are burned for the rest
+    :return: list of final winnings, one per player
+    """
+    deck = CardDeck(ndecks, rng)
+    deck.shuffle()
+    for player in players:
+        player.sits_at(deck)
+    finals = [0] * len(players)
+    for hand in range(hands):
+        if deck.dealt() / deck.count() > penetration:
+            deck.shuffle()
+            for player in players:
+                player.new_shoe()
+        start = deck.top
+        top = start
+        for i, (player, dealer) in enumerate(zip(players, dealers)):
+            deck.top = start
+            finals[i] += play_hand(player, dealer, deck, nplayers)
+            top = min(top, deck.top)
+        deck.top = top
+    return finals
+
+
+def _compare_chunk(players, dealer, seeds, kwargs):
+    """play every player on the same shoes for each seed; returns one row of finals per seed"""
+    return [_compare_evening([copy.deepcopy(player) for player in players],
+                             [copy.deepcopy(dealer) for player in players],
+                             random.Random(seed), **kwargs)
+            for seed in seeds]
+
+
+def compare_strategies(players, trials, dealer=None, workers=1, seed=None, confidence=0.95,
+                       **kwargs):
+    """play every strategy on identical shoes and compare them to the first
+    :param players:     Blackjack objects to compare; the first is the baseline
+    :param trials:      number of evenings (each played once by every strategy)
+    :param dealer:      dealer Blackjack object (Soft17 if None)
+    :param workers:     number of worker processes (None for one per CPU)
+    :param seed:        master seed
+    :param confidence:  confidence level for the intervals
+    :param kwargs:      other simulate() parameters (hands, ndecks, penetration, nplayers);
+                        ndecks must be a number of decks: every strategy replays the same
+                        point of a finite shoe, so there is no infinite deck (ndecks=None)
+    :return: dict with 'titles' and 'stats' (RunningStats of final winnings), one per
+             strategy, and 'differences', one per later strategy: its 'title', the mean
+             paired difference from the baseline, confidence interval half-width, and
+             the variance reduction compared with independent runs
+    >>> from Blackjack import Blackjack, Basic
+    >>> report = compare_strategies([Basic(), Basic(), Blackjack()], 20, seed=3)
+    >>> d = report['differences']
+    >>> d[0]['mean'], d[0]['half_width']   # identical strategies on identical shoes
+    (0.0, 0.0)
+    >>> d[1]['mean'] < 0
+    True
+    >>> compare_strategies([Basic(), Blackjack()], 20, ndecks=None)
+    Traceback (most recent call last):
+    ...
+    ValueError: compare_strategies() replays a finite shoe; ndecks=None is not supported
+    """
+    if kwargs.get('ndecks', 6) is None:
+        raise ValueError('compare_strategies() replays a finite shoe; ndecks=None is not supported')
+    if dealer is None:
+        dealer = Soft17()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seeds = trial_seeds(trials, seed)
+    if workers <= 1:
+        rows = _compare_chunk(players, dealer, seeds, kwargs)
+    else:
+        size = max(1, -(-trials // (4 * workers)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_compare_chunk, players, dealer, seeds[i:i + size], kwargs)
+                       for i in range(0, trials, size)]
+            rows = [row for future in futures for row in future.result()]
+
+    stats = [RunningStats() for player in players]
+    diffs = [RunningStats() for player in players[1:]]
+    for row in rows:
+        for s, final in zip(stats, row):
+            s.add(final)
+        for d, final in zip(diffs, row[1:]):
+            d.add(final - row[0])
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    differences = []
+    for player, s, d in zip(players[1:], stats[1:], diffs):
+        independent = stats[0].variance(1) + s.variance(1)
+        paired = d.variance(1)
+        differences.append({'title': player.title(),
+                            'mean': d.mean,
+                            'half_width': z * d.sem() if paired else 0.0,
+                            'variance_reduction': independent / paired if paired else float('inf')})
+    return {'titles': [player.title() for player in players],
+            'stats': stats,
+            'differences': differences}
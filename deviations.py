@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Count-dependent play deviations (Illustrious 18 style indices) found by rollouts
+
+rollout(deck, player, dealer, up, choice) - play out one choice from a mid-hand state
+deviation_index(cards, up, alternative) - true counts where a deviation from basic strategy pays
+deviation_indices(situations) - the same for a list of situations, in parallel
+ILLUSTRIOUS - the Illustrious 18 plays this game allows (no splits or insurance)
+
+Each sampled shoe state is forked many times with CardDeck.snapshot() and
+Blackjack.snapshot(): every fork restores the deck, hand and dealer and plays
+one choice to the end, drawing with deal_random(). Both choices replay the same
+random draws, so their difference is measured with little noise.
+
+Usage:
+    python deviations.py --states 2000 --rollouts 20 --workers 0
+"""
+
+
+import argparse
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from Blackjack import Soft17, Basic
+from Card import Card
+from CardCounter import CardCounter
+from CardDeck import CardDeck
+from RunningStats import RunningStats
+
+# (player's cards, dealer's up card, deviation from basic strategy)
+# basic_strategy.csv already doubles 11 against an Ace, so that deviation is to hit
+ILLUSTRIOUS = (('T6', 'T', 'stay'), ('T5', 'T', 'stay'), ('64', 'T', 'double'),
+               ('T2', '3', 'stay'), ('T2', '2', 'stay'), ('74', 'A', 'hit'),
+               ('54', '2', 'double'), ('64', 'A', 'double'), ('54', '7', 'double'),
+               ('T6', '9', 'stay'), ('T3', '2', 'hit'), ('T2', '4', 'hit'),
+               ('T2', '5', 'hit'), ('T2', '6', 'hit'), ('T3', '3', 'hit'))
+
+
+def rollout(deck, player, dealer, up, choice):
+    """play one choice to the end from a mid-hand state, as simulate() would settle it
+    The dealer's hole card is drawn first, and redrawn while it makes a blackjack
+    (decisions are only made once the dealer has no blackjack). After a hit the
+    player goes on with her own choose(). The deck, player and dealer are left
+    mid-hand; restore them from snapshots to roll out again.
+    :param deck:    CardDeck holding the undealt cards (drawn with deal_random)
+    :param player:  Blackjack object holding the player's hand
+    :param dealer:  Blackjack object holding just the dealer's up card
+    :param up:      the dealer's up card
+    :param choice:  'stay', 'hit' or 'double'
+    :return: player's winnings in units of the bet
+    >>> deck = CardDeck(1, rng=random.Random(3))
+    >>> player, dealer = Basic(), Soft17()
+    >>> player.dealt([deck.take(Card('Th')), deck.take(Card('Td'))])
+    >>> dealer.dealt([deck.take(Card('6s'))])
+    >>> rollout(deck, player, dealer, Card('6s'), 'stay') in (-1, 0, 1)
+    True
+    >>> deck = CardDeck(6, rng=random.Random(3))
+    >>> deck.shuffle()
+    >>> player.payoff(0); player.dealt([deck.take(Card('Th')), deck.take(Card('6d'))])
+    >>> dealer.payoff(0); dealer.dealt([deck.take(Card('Ts'))])
+    >>> states = deck.snapshot(), player.snapshot(), dealer.snapshot()
+    >>> drawn = []
+    >>> for replay in range(2):   # the same seed from the same snapshot deals the same cards
+    ...     for thing, state in zip((deck, player, dealer), states): thing.restore(state)
+    ...     deck.rng = random.Random(11)
+    ...     result = rollout(deck, player, dealer, Card('Ts'), 'hit')
+    ...     drawn.append(deck.cards[deck.top:states[0][0]])
+    >>> drawn[0] == drawn[1], len(drawn[0]) > 1
+    (True, True)
+    """
+    state = deck.snapshot()
+    hole = deck.deal_random()
+    while up.points + hole.points == 11 and (up.points == 1 or hole.points == 1):
+        deck.restore(state)
+        hole = deck.deal_random()
+    dealer.hit(hole)
+
+    bet = 1
+    if choice == 'double':
+        bet = 2
+        player.hit(deck.deal_random())
+    elif choice == 'hit':
+        player.hit(deck.deal_random())
+        while not player.busted() and player.choose(up) != 'stay':
+            player.hit(deck.deal_random())
+
+    while dealer.choose(up) == 'hit' and not dealer.busted():
+        dealer.hit(deck.deal_random())
+    if player.beats(dealer):
+        return bet
+    elif dealer.beats(player):
+        return -bet
+    return 0
+
+
+def deviation_index(cards, up, alternative, states=2000, rollouts=20, ndecks=6,
+                    depth=(0.1, 0.8), system='hilo', tc_range=(-8, 8), seed=None):
+    """true counts at which a deviation from basic strategy pays, by rollouts
+    Shoes are shuffled and dealt to a random depth (after taking out the player's
+    cards and the up card), and the state is bucketed by its true count, rounded.
+    Each state is then forked rollouts times for both basic strategy's choice and
+    the alternative, with the same random draws for each.
+    :param cards:        the player's two cards as ranks, e.g. 'T6'
+    :param up:           the dealer's up card rank, e.g. 'T'
+    :param alternative:  the deviation: 'stay', 'hit' or 'double'
+    :param states:       shoe states to sample
+    :param rollouts:     forks of each state for each choice
+    :param ndecks:       decks per shoe
+    :param depth:        range of the fraction of the shoe dealt before the hand
+    :param system:       count system (see CardCounter.COUNT_SYSTEMS) for the true count
+    :param tc_range:     true counts beyond this range are lumped into its ends
+    :param seed:         seed for the shuffles and draws
+    :return: dict with 'cards', 'up', 'basic' and 'alternative' choices, 'index' (the true
+             count where the alternative's EV crosses basic strategy's, by linear
+             interpolation between buckets, or None if it never does) and 'buckets', a
+             RunningStats of alternative minus basic winnings (per unit bet) per true count
+    >>> result = deviation_index('T6', 'T', 'stay', states=50, rollouts=4, seed=1)
+    >>> result['basic'], sum(stats.n for stats in result['buckets'].values())
+    ('hit', 200)
+    """
+    rng = random.Random(seed)
+    deck = CardDeck(ndecks, rng=rng)
+    fork_rng = random.Random()
+    player, dealer, counter = Basic(), Soft17(), CardCounter(system, ndecks=ndecks)
+    player_cards = [Card(rank + suit) for rank, suit in zip(cards, 'HD')]
+    up_card = Card(up + 'S')
+    player.dealt(player_cards)
+    basic = player.choose(up_card)
+    if alternative == basic:
+        raise ValueError('{} is basic strategy for {} against {}'.format(alternative, cards, up))
+    buckets = {}
+
+    for state in range(states):
+        deck.rng = rng
+        deck.shuffle()
+        counter.new_shoe()
+        for card in player_cards + [up_card]:
+            deck.take(card)
+            counter.see(card)
+        for i in range(int(deck.undealt() * rng.uniform(*depth))):
+            counter.see(deck.deal())
+        tc = min(max(round(counter.count * 52 / deck.undealt()), tc_range[0]), tc_range[1])
+        stats = buckets.setdefault(tc, RunningStats())
+
+        player.payoff(0)
+        player.dealt(player_cards)
+        dealer.payoff(0)
+        dealer.dealt([up_card])
+        deck_state, player_state, dealer_state = deck.snapshot(), player.snapshot(), dealer.snapshot()
+        deck.rng = fork_rng
+        for fork in range(rollouts):
+            fork_seed = rng.getrandbits(32)
+            results = []
+            for choice in (basic, alternative):
+                deck.restore(deck_state)
+                player.restore(player_state)
+                dealer.restore(dealer_state)
+                fork_rng.seed(fork_seed)
+                results.append(rollout(deck, player, dealer, up_card, choice))
+            stats.add(results[1] - results[0])
+
+    return {'cards': cards, 'up': up, 'basic': basic, 'alternative': alternative,
+            'index': crossing(buckets), 'buckets': dict(sorted(buckets.items()))}
+
+
+def crossing(buckets, min_n=100):
+    """true count where the mean difference changes sign, interpolated between
+    the closest buckets with at least min_n samples (None if it never does)
+    >>> stats = {}
+    >>> for tc, diffs in ((-1, (-3, -1)), (0, (-1, 0)), (1, (1, 2))):
+    ...     stats[tc] = RunningStats()
+    ...     for x in diffs: stats[tc].add(x)
+    >>> crossing(stats, min_n=2)
+    0.25
+    """
+    points = [(tc, stats.mean) for tc, stats in sorted(buckets.items()) if stats.n >= min_n]
+    for (tc0, mean0), (tc1, mean1) in zip(points, points[1:]):
+        if mean0 == 0:
+            return tc0
+        if (mean0 < 0) != (mean1 < 0):
+            return tc0 + (tc1 - tc0) * mean0 / (mean0 - mean1)
+    return None
+
+
+def _index_job(args):
+    situation, kwargs = args
+    return deviation_index(*situation, **kwargs)
+
+
+def deviation_indices(situations=ILLUSTRIOUS, workers=1, seed=None, **kwargs):
+    """deviation_index() for each situation, spread over worker processes
+    :param situations:  (cards, up, alternative) triples
+    :param workers:     worker processes (None for one per CPU)
+    :param seed:        master seed; each situation gets its own seed from it
+    :param kwargs:      other deviation_index() parameters
+    :return: list of deviation_index() results, in situation order
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    master = random.Random(seed)
+    jobs = [(situation, dict(kwargs, seed=master.getrandbits(64))) for situation in situations]
+    if workers <= 1:
+        return [_index_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_index_job, jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--states', type=int, default=2000, help='shoe states per situation')
+    parser.add_argument('--rollouts', type=int, default=20, help='forks of each state per choice')
+    parser.add_argument('--ndecks', type=int, default=6, help='decks per shoe')
+    parser.add_argument('--system', default='hilo', help='count system for the true count')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes (0 for one per CPU)')
+    parser.add_argument('--seed', type=int, help='master seed')
+    args = parser.parse_args(argv)
+
+    results = deviation_indices(workers=args.workers or None, seed=args.seed, states=args.states,
+                                rollouts=args.rollouts, ndecks=args.ndecks, system=args.system)
+    print('{:8s}{:>4s}{:>9s}{:>9s}{:>8s}'.format('hand', 'up', 'basic', 'deviate', 'index'))
+    for result in results:
+        index = '' if result['index'] is None else '{:+.1f}'.format(result['index'])
+        print('{:8s}{:>4s}{:>9s}{:>9s}{:>8s}'.format(
+            result['cards'], result['up'], result['basic'], result['alternative'], index))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
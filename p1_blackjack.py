@@ -3,50 +3,71 @@
 
 colaboration - office hours, Arunima Roy, Andrew Turner, Ian Basco, Brooke Cummins
 simulate(player) - simulate playing an evening's worth of blackjack
-collect_winnings(amount) - call payoff() to add or subtract bets 
-visualize(player) - simulate and plot results of a blackjack strategy
+play_hand(player, dealer, deck) - play one hand from the deck and pay it off
+visualize(trials, player) - simulate and plot results of a blackjack strategy
+plot_results(winnings, lo_watermark, histogram) - plot accumulated trial results
 overlay_bell_curve(mu, sigma, n, bins) - plot a normal curve atop an 
 histogram in current pylab figure
+summarize(results, quantiles) - summary statistics of (final, lo, hi) trial results
+main(argv) - command-line entry point: python p1_blackjack.py --help
+
+numpy and pylab are only imported when plotting, so stats-only runs start fast.
 """
 
 
 from Card import Card
-from Blackjack import Blackjack, Soft17, Basic
+from Blackjack import Blackjack, Soft17, Basic, CHOICES
 from CardCounter import CardCounter
-from CardDeck import CardDeck
+from CardDeck import CardDeck, InfiniteDeck
+import argparse
+import json
 import math
-import numpy as np
-import pylab
+import sys
+
+PLAYERS = {'Blackjack': Blackjack, 'Soft17': Soft17, 'Basic': Basic, 'CardCounter': CardCounter}
+HISTOGRAM_WIDTH = 10   # $ bins of the winnings histograms that quantiles are read from
 
 def simulate(player,
-             dealer=Soft17(),
+             dealer=None,
              hands=100,
              ndecks=6,
              penetration=0.7,
-             nplayers=7):
+             nplayers=7,
+             rng=None,
+             shoes=None,
+             stats=None,
+             log=None):
     """simulate playing an evening's worth of blackjack
     :param player:           Blackjack object representing the player
-    :param dealer:           Blackjack object representing the dealer
+    :param dealer:           Blackjack object representing the dealer (a new Soft17 if None)
     :param hands:            Number of hands to simulate
-    :param ndecks:           Number of decks in each shoe
+    :param ndecks:           Number of decks in each shoe (None for an InfiniteDeck, drawing with replacement)
     :param penetration:      Depth of shoe before reshuffling
     :param nplayers:         Number of other players present (not simulated, but cards seen)
-    :return: (final, lo, hi) player's accumulated winnings
+    :param rng:              random.Random or numpy Generator for shuffling (global random if None)
+    :param shoes:            pre-generated shoes to play through (see CardDeck.shoe_stream)
+    :param stats:            SimStats object to time each phase and call its hooks (None for no cost)
+    :param log:              EventLog to record every hand in (None for no cost)
+    :return: (final, lo, hi) player's accumulated winnings, followed by stats if given
     """
     
-    deck = CardDeck(ndecks)  # create shoe of cards using ndecks 
+    if dealer is None:
+        dealer = Soft17()
+    if ndecks is None:
+        deck = InfiniteDeck(rng)             # cards drawn with replacement: never shuffled
+    else:
+        deck = CardDeck(ndecks, rng, shoes)  # create shoe of cards using ndecks 
     deck.shuffle()           # shuffle the deck
-    winnings = []            # append here for player's accumulated winnings
-    
-    def collect_winnings(amount):
-        """handles payoffs to player and dealer
-        call payoff() from Blackjack
-        append to winnings list for player's accumulated winnings
-        """
-        player.payoff(amount)         # player payoff
-        dealer.payoff(-amount)        # dealer payoff
-        winnings.append(amount)       # keep track of winnings
+    player.sits_at(deck)     # player may watch the shoe (e.g., for a true count)
+    player.new_shoe()        # a fresh shoe, whatever the player counted in an earlier evening
+    final = 0                # player's accumulated winnings
+    lo = 0                   # lo-watermark of accumulated winnings
+    hi = 0                   # hi-watermark of accumulated winnings
     
+    if stats is not None:
+        stats.start()
+    if log is not None:
+        log.start_evening()
     for hand in range(hands):
         # shuffle deck if depth of shoe exceeds penetration
         # penetration parameter keeps you starting with a freshly shuffled deck before you get to the end
@@ -54,118 +75,201 @@ def simulate(player,
         if shoe_depth > penetration:
             deck.shuffle()
             player.new_shoe()
-            
-        # place bets before dealing out the cards
-        # don't need to track bets or winnings of other players
-        player_bet = player.bet()
-        
-        # deal 2 cards for new hand and place in a list
-        player_hand = [deck.deal(), deck.deal()]   # player is dealt 2 cards
-        player.dealt(player_hand) 
-        
-        # deal 2 cards for all other players 
-        for nplayer in range(nplayers):
-            cards = [deck.deal(), deck.deal()]
-            player.sees(cards) 
-            
-        ## now that player (me) and other players have their hands, set up the dealer ## 
-        
-        dealer_hand = [deck.deal(), deck.deal()] # dealer is dealt 2 cards just like the players
-        dealer.dealt(dealer_hand)
-        dealer_known: Card = dealer_hand[1]      # dealer's second card [1] is known bc face up. first card [0] unknown bc face down
-        player.sees([dealer_known])              # player sees this card since it is face up
-        
-        # if anyone has blackjack, pay up and end game
-        if player.has_bj():
-            if not dealer.has_bj():                 # player has bj and dealer does not, reward is 1.5*bet
-                collect_winnings(player_bet * 1.5)
-            else:                                   # nobody wins or loses bets in a tie. get your bet back
-                collect_winnings(0.0)
-            continue                                # game must continue from here
-        elif dealer.has_bj():
-            # if dealer has bj, player automatically loses the hand and loses bet
-            collect_winnings(-player_bet)
-            continue                                # if nobody has bj, game continues
+            if stats is not None and stats.on_shuffle is not None:
+                stats.on_shuffle(deck)
+        if stats is not None:
+            stats.lap('shuffle', shoe_depth > penetration)
         
-        # player actions: stay, hit, double
-        player_action = player.choose(dealer_known)
-        while player_action != 'stay' and not player.busted():
-            player_action = player.choose(dealer_known)      # player stays and dealer knows what player has
-            if player_action == 'hit':
-                player.hit(deck.deal())                      # deal a new card with each hit
-            elif player_action == 'double': 
-                player_bet += player_bet                     # ante up another bet to double down
-                player.hit(deck.deal())
-                break                                        # only allowed 1 hit when doubling. exit the while loop
-                
-        # dealer actions - Soft17 strategy must hit when < 16 and stay when > 17
-        while dealer.choose(dealer_known) == 'hit' and not dealer.busted():
-            card = deck.deal()          # deal out a new card for a hit
-            dealer.hit(card)            # dealt card goes into dealer's hand
-            player.sees([card])         # hits are dealt face up, so player sees it
-        
-        # print("Player hand: ", player.hand)
-        # print("Dealer hand: ", dealer.hand)
-        
-        # determine winner and collect winnings
-        if player.beats(dealer):              # player wins
-            # amount bet is amount paid out
-            collect_winnings(player_bet)      # amount bet is gained
-        elif dealer.beats(player):            # dealer wins
-            collect_winnings(-player_bet)     # amount bet is lost
-        else:
-            collect_winnings(0)               # nothing gained or lost in a tie
-    
-    # calculate winnings, lo-watermark, and hi-watermark
-    final = 0
-    lo = 0
-    hi = 0
-    for winning in winnings:
-        final += winning
+        # play the hand and keep track of winnings and watermarks
+        final += play_hand(player, dealer, deck, nplayers, stats, log)
         if final < lo: 
             lo = final
         elif final > hi:
             hi = final
     
+    if stats is not None:
+        return (final, lo, hi, stats)
     return (final, lo, hi)
 
-def visualize(trials, player=Basic()):
-    """simulate and plot results of a blackjack strategy
-    :param trials:   number of trials to simulate
-    :param player:   player Blackjack object to simulate
+def play_hand(player, dealer, deck, nplayers=7, stats=None, log=None):
+    """play one hand of blackjack from the deck and pay it off
+    :param player:           Blackjack object representing the player
+    :param dealer:           Blackjack object representing the dealer
+    :param deck:             CardDeck to deal from (not reshuffled here)
+    :param nplayers:         Number of other players present (not simulated, but cards seen)
+    :param stats:            SimStats object to time each phase and call its hooks, or None
+    :param log:              EventLog to record the hand in, or None
+    :return: player's winnings for the hand
     """
-    # initialize data for plot
-    winnings = []
-    hi_watermark = []
-    lo_watermark = []
-    
-    # loop over trials
-    for i in range(trials):
-        # collect data for the trials by calling simulate()
-        final, lo, hi = simulate(player)
-        # append return numbers to empty lists (return (final, lo, hi))
-        winnings.append(final)
-        lo_watermark.append(lo)
-        hi_watermark.append(hi)
+    
+    def settle(amount):
+        """handles payoffs to player and dealer
+        call payoff() from Blackjack and return the player's winnings
+        """
+        if log is not None:           # before payoff() clears the hands
+            log.record(player_bet, amount, count, true_count, undealt,
+                       [card.ordinal for card in player_hand], [card.ordinal for card in dealer_hand],
+                       decisions, player.soft_value(), dealer.soft_value())
+        player.payoff(amount)         # player payoff
+        dealer.payoff(-amount)        # dealer payoff
+        if stats is not None:
+            stats.lap('settle')
+            if stats.on_payoff is not None:
+                stats.on_payoff(amount)
+        return amount
+    
+    if log is not None:
+        # the count the bet is made on, and room for the rest of the hand
+        count = getattr(player, 'count', 0)
+        true_count = player.true_count() if hasattr(player, 'true_count') else math.nan
+        undealt = deck.undealt()
+        decisions = []
+    
+    # place bets before dealing out the cards
+    # don't need to track bets or winnings of other players
+    player_bet = player.bet()
+    
+    # deal 2 cards for new hand and place in a list
+    player_hand = [deck.deal(), deck.deal()]   # player is dealt 2 cards
+    player.dealt(player_hand) 
+    
+    # deal 2 cards for all other players, seen by the player all at once
+    cards = [deck.deal() for card in range(2 * nplayers)]
+    player.sees(cards) 
         
-    # print("Winnings = ", winnings)
-    # print("\nhi watermark = ", hi_watermark)
-    # print("\nlo watermark = ", lo_watermark)
+    ## now that player (me) and other players have their hands, set up the dealer ## 
+    
+    dealer_hand = [deck.deal(), deck.deal()] # dealer is dealt 2 cards just like the players
+    dealer.dealt(dealer_hand)
+    dealer_known: Card = dealer_hand[1]      # dealer's second card [1] is known bc face up. first card [0] unknown bc face down
+    player.see(dealer_known)                 # player sees this card since it is face up
+    if stats is not None:
+        stats.lap('deal')
+        if stats.on_deal is not None:
+            stats.on_deal(player, dealer_known)
+    
+    # if anyone has blackjack, pay up and end game
+    if player.has_bj():
+        if not dealer.has_bj():                 # player has bj and dealer does not, reward is 1.5*bet
+            return settle(player_bet * 1.5)
+        else:                                   # nobody wins or loses bets in a tie. get your bet back
+            return settle(0.0)
+    elif dealer.has_bj():
+        # if dealer has bj, player automatically loses the hand and loses bet
+        return settle(-player_bet)              # if nobody has bj, game continues
+    
+    # player actions: stay, hit, double (every choice is counted, hooked and logged here)
+    while True:
+        player_action = player.choose(dealer_known)      # player stays and dealer knows what player has
+        if stats is not None:
+            stats.counts['decision'] += 1
+            if stats.on_decision is not None:
+                stats.on_decision(player, player_action)
+        if log is not None:
+            decisions.append(CHOICES.index(player_action))
+        if player_action == 'hit':
+            card = deck.deal()                           # deal a new card with each hit
+            player.hit(card)
+            if log is not None:
+                player_hand.append(card)
+            if player.busted():
+                break
+        elif player_action == 'double': 
+            player_bet += player_bet                     # ante up another bet to double down
+            card = deck.deal()
+            player.hit(card)
+            if log is not None:
+                player_hand.append(card)
+            break                                        # only allowed 1 hit when doubling. exit the while loop
+        else:
+            break                                        # stay
+            
+    if stats is not None:
+        stats.lap('decision', 0)    # choices were counted as they were made
+            
+    # dealer actions - Soft17 strategy must hit when < 16 and stay when > 17
+    while dealer.choose(dealer_known) == 'hit' and not dealer.busted():
+        card = deck.deal()          # deal out a new card for a hit
+        dealer.hit(card)            # dealt card goes into dealer's hand
+        player.see(card)            # hits are dealt face up, so player sees it
+        if log is not None:
+            dealer_hand.append(card)
+    if stats is not None:
+        stats.lap('dealer')
+    
+    # print("Player hand: ", player.hand)
+    # print("Dealer hand: ", dealer.hand)
+    
+    # determine winner and collect winnings
+    if player.beats(dealer):              # player wins
+        # amount bet is amount paid out
+        return settle(player_bet)         # amount bet is gained
+    elif dealer.beats(player):            # dealer wins
+        return settle(-player_bet)        # amount bet is lost
+    else:
+        return settle(0)                  # nothing gained or lost in a tie
+
+def visualize(trials, player=None, workers=1, seed=None, target=None, worst_target=None, batch=1000):
+    """simulate and plot results of a blackjack strategy
+    :param trials:        number of trials to simulate (the most to run if a target is given)
+    :param player:        player Blackjack object to simulate (a new Basic if None)
+    :param workers:       number of worker processes to spread the trials over (None for all CPUs)
+    :param seed:          master seed; the same seed gives the same plot for any number of workers
+    :param target:        stop once the 95% confidence interval on mean winnings is this narrow ($ half-width)
+    :param worst_target:  stop once the one on the 5% quantile of worst moments is this narrow
+    :param batch:         trials between checks of the targets
+    """
+    from trials import iter_until  # trials imports simulate from this module
+    from RunningStats import RunningStats, Histogram
+    
+    if player is None:
+        player = Basic()
     
-    # use numpy to calculate mean and stdev of winnings
-    mean = np.mean(winnings)
-    stdev = np.std(winnings)
+    # initialize streaming accumulators for plot (constant memory, whatever the trial count)
+    winnings = RunningStats()
+    lo_watermark = RunningStats()
+    histogram = Histogram(HISTOGRAM_WIDTH)   # fine bins, coarsened for plotting
+    
+    # collect data for the trials by calling simulate() (in parallel if workers > 1)
+    # stop early once any targets are met (all trials run without targets)
+    for final, lo, hi in iter_until(trials, player, target=target, worst_target=worst_target,
+                                    batch=batch, workers=workers, seed=seed):
+        winnings.add(final)
+        lo_watermark.add(lo)
+        histogram.add(final)
+    if winnings.n < trials:
+        print(f'targets met after {winnings.n} of {trials} trials')
+    return plot_results(winnings, lo_watermark, histogram)
+
+
+def plot_results(winnings, lo_watermark, histogram):
+    """plot accumulated results of a blackjack strategy (see visualize)
+    :param winnings:      RunningStats of the trials' final winnings
+    :param lo_watermark:  RunningStats of the trials' worst moments
+    :param histogram:     Histogram of the trials' final winnings
+    :return: bins of the plotted histogram
+    """
+    import numpy as np
+    import pylab
+    
+    trials = winnings.n
+    
+    # mean and stdev of winnings (population stdev, as np.std)
+    mean = winnings.mean
+    stdev = winnings.stdev()
     
     # create histogram and get n and bins as specified in guidance
+    # the bars are drawn from the binned counts, so the raw winnings are never kept
     # use unpack_variable to debug "ValueError: too many values to unpack (expected 2)"
         # approach taken from: https://careerkarma.com/blog/python-valueerror-too-many-values-to-unpack-expected-2/
-    n, bins, unpack_variable = pylab.hist(winnings, bins=20)
+    edges, counts = histogram.rebin(20)
+    n, bins, unpack_variable = pylab.hist(edges[:-1], bins=edges, weights=counts)
     
     # overlay calculated variables into the function as provided below
     overlay_bell_curve(mean, stdev, n, bins)
     
     # calculate range for worst moment 
-    lo_min = np.min(lo_watermark)
+    lo_min = lo_watermark.min
     # use for flexible placement on chart on y-axis
     y_max = np.max(n)
     
@@ -199,6 +303,8 @@ def overlay_bell_curve(mu, sigma, n, bins):
     :param n:     number of events tracked in histogram
     :param bins:  number of bins in histogram
     """
+    import pylab
+    
     def f(x):
         """probability density function of normal distribution
         math.pow - Find value of x raised to the power of y: https://www.w3schools.com/python/ref_math_pow.asp
@@ -240,7 +346,97 @@ def overlay_bell_curve(mu, sigma, n, bins):
     pylab.plot(x, y, ls = 'solid', color = 'orange')
 
 
+def summarize(results, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), width=HISTOGRAM_WIDTH):
+    """summary statistics of trial results
+    :param results:    list of (final, lo, hi) from simulate()
+    :param quantiles:  quantiles of the final winnings to report
+    :param width:      $ bin width of the histogram the quantiles are read from
+    :return: dict with trials, mean, stdev, worst moment (lowest lo), best moment
+             (highest hi) and the quantiles of final winnings keyed like 'q50'
+    Results are consumed as a stream in constant memory, so quantiles are
+    read off a histogram (interpolated within a bin), so they are only
+    accurate to within a bin: below, the median of 0 reads as 5.0, the
+    middle of its $10 bin. Histograms merge exactly, so shards.merge()
+    reports the same quantiles for a sharded run.
+    >>> summarize([(100, -50, 150), (-200, -300, 0), (0, 0, 0)], quantiles=(0.5,))
+    {'trials': 3, 'mean': -33.33333333333333, 'stdev': 124.72191289246472, 'worst': -300, 'best': 150, 'q50': 5.0}
+    """
+    from RunningStats import RunningStats, Histogram
+    finals = RunningStats()
+    histogram = Histogram(width)
+    worst = best = 0
+    for final, lo, hi in results:
+        finals.add(final)
+        histogram.add(final)
+        worst = min(worst, lo)
+        best = max(best, hi)
+    summary = {'trials': finals.n,
+               'mean': finals.mean,
+               'stdev': finals.stdev(),   # as np.std in visualize
+               'worst': worst,
+               'best': best}
+    for q in quantiles:
+        summary['q{:g}'.format(100 * q)] = histogram.quantile(q)
+    return summary
+
+
+def main(argv=None):
+    """command-line entry point: simulate, then print (or write) summary statistics"""
+    parser = argparse.ArgumentParser(description='Simulate evenings of blackjack and summarize the winnings.')
+    parser.add_argument('--player', choices=PLAYERS, default='CardCounter', help='player strategy')
+    parser.add_argument('--trials', type=int, default=1000,
+                        help='evenings to simulate (the most to run with --target or --worst-target)')
+    parser.add_argument('--hands', type=int, default=100, help='hands per evening')
+    parser.add_argument('--ndecks', type=int, default=6, help='decks per shoe (0 for an infinite deck)')
+    parser.add_argument('--penetration', type=float, default=0.7, help='depth of shoe before reshuffling')
+    parser.add_argument('--nplayers', type=int, default=7, help='other players at the table')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes (0 for one per CPU)')
+    parser.add_argument('--seed', type=int, help='master seed for reproducible runs')
+    parser.add_argument('--quantiles', type=float, nargs='*', default=[0.05, 0.25, 0.5, 0.75, 0.95],
+                        help='quantiles of final winnings to report')
+    parser.add_argument('--target', type=float,
+                        help='stop once the 95%% confidence interval on mean winnings is this narrow ($ half-width)')
+    parser.add_argument('--worst-target', type=float,
+                        help='stop once the one on the 5%% quantile of worst moments is this narrow')
+    parser.add_argument('--batch', type=int, default=1000, help='evenings between checks of the targets')
+    parser.add_argument('--json', metavar='FILE', help='write the summary as JSON to FILE')
+    parser.add_argument('--plot', action='store_true', help='also plot the histogram (imports pylab)')
+    args = parser.parse_args(argv)
+
+    from trials import iter_until
+    player = PLAYERS[args.player]()
+    results = iter_until(args.trials, player, target=args.target, worst_target=args.worst_target,
+                         batch=args.batch, workers=args.workers or None, seed=args.seed,
+                         hands=args.hands, ndecks=args.ndecks or None, penetration=args.penetration,
+                         nplayers=args.nplayers)
+    if args.plot:
+        # plot the trials summarized, as they stream past, rather than simulating again
+        from RunningStats import RunningStats, Histogram
+        winnings, lo_watermark, histogram = RunningStats(), RunningStats(), Histogram(HISTOGRAM_WIDTH)
+
+        def watched(results):
+            for final, lo, hi in results:
+                winnings.add(final)
+                lo_watermark.add(lo)
+                histogram.add(final)
+                yield final, lo, hi
+        results = watched(results)
+    summary = summarize(results, args.quantiles)
+    summary['player'] = player.title()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+    else:
+        for key, value in summary.items():
+            print('{:10s} {}'.format(key, value if isinstance(value, (int, str)) else round(value, 2)))
+    if args.plot:
+        import pylab
+        plot_results(winnings, lo_watermark, histogram)
+        pylab.show()
+    return 0
+
+
 if __name__ == "__main__":
     # visualize(1000, player=Basic())
     # visualize(1000, player=Soft17())
-    visualize(1000, player=CardCounter())
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Bet-ramp optimization from cached per-true-count EV and variance estimates
+
+estimate(evenings) - simulate flat bets once, giving each true count's frequency, EV and variance
+cached_estimate(cache) - estimate(), kept on disk by a hash of its parameters
+smooth(estimates) - EV fitted as a line in the true count, for ramps that only rise
+score(bets, estimates) - EV, variance and growth of bet ramps, many at once, without simulating
+kelly_bets(estimates, bankroll) - bet per true count: a fraction of Kelly within table and spread limits
+optimize(estimates, bankroll) - the best scoring Kelly ramp over a grid of fractions and spreads
+to_ramp(bets, counts) - per-true-count bets as (count, bet) steps for CardCounter(ramp_on='true')
+
+Playing decisions do not depend on the bet, so one simulation of flat one-unit
+bets, logged with EventLog, gives every true count's frequency and mean and
+mean square winnings per unit bet. A ramp's EV and variance per hand are then
+sums over the true counts, so thousands of candidate ramps are scored in a few
+numpy operations. Ramps are scored by their growth rate, EV - variance / (2
+bankroll), the expected log growth of the bankroll per hand to second order.
+
+Usage:
+    python ramps.py --bankroll 10000 --min 10 --max 1000 --out ramp.json
+    (then CardCounter.from_file('ramp.json'))
+"""
+
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import random
+import sys
+import tempfile
+import numpy as np
+from CardCounter import CardCounter
+from EventLog import EventLog, read_log
+from p1_blackjack import simulate
+
+CACHE = 'ramp_cache'
+VERSION = 2                       # part of every cache key; bump to invalidate cached estimates
+FRACTIONS = (0.25, 0.5, 0.75, 1.0)
+SPREADS = (4, 8, 12, 16, 20, 50, 100)
+
+
+def estimate(evenings=2000, hands=100, system='hilo', ndecks=6, penetration=0.7, nplayers=7,
+             lo=-10, hi=10, seed=0):
+    """each true count's frequency, EV and variance per unit bet, from flat bets
+    :param evenings:  simulate() calls (of hands hands each) to estimate from
+    :param system:    count system (see CardCounter.COUNT_SYSTEMS)
+    :param lo, hi:    true counts (rounded half up, as to_ramp() steps are read) beyond these
+                      are lumped in with them
+    :param seed:      seed for the shuffles
+    :return: dict of lists indexed by true count from lo to hi: 'counts', 'hands',
+             'ev' (mean winnings per unit of the original bet) and 'second'
+             (mean square winnings per unit), plus the parameters
+    >>> estimates = estimate(evenings=20, hands=50, lo=-2, hi=2)
+    >>> estimates['counts'], sum(estimates['hands'])
+    ([-2, -1, 0, 1, 2], 1000)
+
+    One player plays every evening, and each evening starts with a fresh shoe and count:
+    >>> player, path = CardCounter(ramp=((0, 1),)), os.path.join(tempfile.mkdtemp(), 'flat.bjlog')
+    >>> with EventLog(path) as log:
+    ...     for evening in range(3):
+    ...         final = simulate(player, hands=30, rng=random.Random(evening), log=log)
+    >>> events = read_log(path)
+    >>> events['count'][events['hand'] == 0].tolist()
+    [0, 0, 0]
+    """
+    rng = random.Random(seed)
+    player = CardCounter(system, ramp=((0, 1),), ramp_on='true', ndecks=ndecks)   # flat bets
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'flat.bjlog')
+        with EventLog(path) as log:
+            for evening in range(evenings):
+                simulate(player, hands=hands, ndecks=ndecks, penetration=penetration,
+                         nplayers=nplayers, rng=rng, log=log)
+        events = read_log(path)
+        tc = np.clip(np.floor(events['true_count'] + 0.5), lo, hi).astype(np.intp) - lo
+        units = events['payoff'] / events['bet']
+        doubled = np.any(events['decisions'] == 2, axis=1)
+        units = np.where(doubled, 2 * units, units)   # per unit of the original bet
+        size = hi - lo + 1
+        n = np.bincount(tc, minlength=size)
+        won = np.bincount(tc, weights=units, minlength=size)
+        squared = np.bincount(tc, weights=units * units, minlength=size)
+        del events
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ev = np.where(n > 0, won / n, 0.0)
+        second = np.where(n > 0, squared / n, 1.0)
+    return {'counts': list(range(lo, hi + 1)), 'hands': n.tolist(), 'ev': ev.tolist(),
+            'second': second.tolist(), 'system': system, 'ndecks': ndecks,
+            'penetration': penetration, 'nplayers': nplayers}
+
+
+def cached_estimate(cache=CACHE, **kwargs):
+    """estimate(**kwargs), read from the cache directory if it has been made before
+    (the file is named by a hash of the parameters, so any change makes a new estimate)
+    """
+    arguments = inspect.signature(estimate).bind(**kwargs)
+    arguments.apply_defaults()
+    config = dict(arguments.arguments, version=VERSION)
+    key = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:32]
+    path = os.path.join(cache, key + '.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    result = estimate(**kwargs)
+    os.makedirs(cache, exist_ok=True)
+    temp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp, 'w') as f:
+        json.dump(result, f)
+    os.replace(temp, path)
+    return result
+
+
+def smooth(estimates):
+    """estimates with EV as a straight line in the true count and one mean square,
+    both fitted weighted by hands, so sparse true counts do not make the ramp jagged
+    >>> smooth({'counts': [0, 1, 2], 'hands': [1, 2, 1], 'ev': [0.0, 0.05, 0.02], 'second': [1.0, 1.2, 1.4]})['ev']
+    [0.02, 0.03, 0.04]
+    """
+    p, ev, second = _arrays(estimates)
+    counts = np.asarray(estimates['counts'], dtype=np.float64)
+    slope, intercept = np.polyfit(counts, ev, 1, w=np.sqrt(p))
+    smoothed = dict(estimates)
+    smoothed['ev'] = np.round(intercept + slope * counts, 12).tolist()
+    smoothed['second'] = [float(p @ second)] * len(counts)
+    return smoothed
+
+
+def _arrays(estimates):
+    n = np.asarray(estimates['hands'], dtype=np.float64)
+    return n / n.sum(), np.asarray(estimates['ev']), np.asarray(estimates['second'])
+
+
+def score(bets, estimates, bankroll):
+    """EV, variance and growth per hand of one ramp, or of many at once
+    :param bets:       bet for each true count (as estimates['counts']), or a 2-d array, a ramp per row
+    :param estimates:  from estimate() or cached_estimate()
+    :param bankroll:   bankroll, for the growth rate
+    :return: (ev, variance, growth) per hand, arrays if bets is 2-d
+    >>> estimates = {'hands': [50, 50], 'ev': [-0.02, 0.04], 'second': [1.2, 1.2]}
+    >>> ev, variance, growth = score([10, 10], estimates, 1000)
+    >>> round(float(ev), 6), round(float(variance), 6)
+    (0.1, 119.99)
+    >>> score(np.array([[10, 10], [10, 100]]), estimates, 1000)[0].round(6).tolist()
+    [0.1, 1.9]
+    """
+    p, ev, second = _arrays(estimates)
+    bets = np.asarray(bets, dtype=np.float64)
+    mean = bets @ (p * ev)
+    variance = (bets * bets) @ (p * second) - mean * mean
+    return mean, variance, mean - variance / (2 * bankroll)
+
+
+def kelly_bets(estimates, bankroll, fraction=0.5, table_min=10, table_max=1000, spread=None, unit=5):
+    """bet for each true count: a fraction of the Kelly bet (bankroll x EV / mean square
+    winnings per unit), within the table limits and a spread of the table minimum
+    :param fraction:   fraction of Kelly to bet
+    :param table_min:  smallest bet (also bet when the EV is negative)
+    :param table_max:  largest bet
+    :param spread:     largest bet as a multiple of table_min (None for no limit besides table_max)
+    :param unit:       bets are rounded down to multiples of this
+    :return: numpy array of bets, one per true count
+    >>> estimates = {'hands': [1, 1, 1], 'ev': [-0.01, 0.005, 0.02], 'second': [1.3, 1.3, 1.3]}
+    >>> kelly_bets(estimates, 10000, spread=8).tolist()
+    [10.0, 15.0, 75.0]
+    """
+    p, ev, second = _arrays(estimates)
+    top = table_max if spread is None else min(table_max, table_min * spread)
+    bets = fraction * bankroll * ev / second
+    bets = np.floor(bets / unit) * unit
+    return np.clip(bets, table_min, top)
+
+
+def optimize(estimates, bankroll, table_min=10, table_max=1000, kelly=0.5, fractions=FRACTIONS,
+             spreads=SPREADS, unit=5, smoothed=True):
+    """score a Kelly ramp for every fraction and spread, and pick the best growth rate
+    Growth is scored against kelly x bankroll: the certainty equivalent of a
+    bettor who, without limits, would bet that fraction of Kelly. Within table
+    and spread limits, another fraction's ramp can score better.
+    :param kelly:      fraction of Kelly the scoring is risk-averse as
+    :param fractions:  Kelly fractions to try
+    :param spreads:    spreads (largest bet over table_min) to try
+    :param smoothed:   True to bet and score on smooth(estimates), for a ramp that only rises
+    :return: dict with the best 'bets' (per true count), 'ramp' (CardCounter steps),
+             'fraction', 'spread', 'ev', 'sd', 'growth', 'ruin' (the diffusion estimate of
+             losing the bankroll, exp(-2 ev bankroll / variance)) and 'n0' (variance / ev^2),
+             and 'candidates', a list of (fraction, spread, ev, sd, growth) for every candidate
+    >>> estimates = {'counts': [-1, 0, 1, 2], 'hands': [30, 40, 20, 10],
+    ...              'ev': [-0.02, -0.005, 0.005, 0.02], 'second': [1.3, 1.3, 1.3, 1.3]}
+    >>> best = optimize(estimates, 10000, kelly=1.0, smoothed=False)
+    >>> best['ramp'], best['fraction'], best['spread']
+    (((-1.5, 10), (0.5, 35), (1.5, 150)), 1.0, 16)
+    >>> optimize(estimates, 10000, kelly=0.5, smoothed=False)['ramp']
+    ((-1.5, 10), (0.5, 15), (1.5, 75))
+    """
+    if smoothed:
+        estimates = smooth(estimates)
+    candidates = [(fraction, spread) for fraction in fractions for spread in spreads]
+    bets = np.array([kelly_bets(estimates, bankroll, fraction, table_min, table_max, spread, unit)
+                     for fraction, spread in candidates])
+    ev, variance, growth = score(bets, estimates, kelly * bankroll)   # every candidate in one go
+    best = int(np.argmax(growth))
+    mean, var = float(ev[best]), float(variance[best])
+    return {'bets': bets[best].tolist(),
+            'ramp': to_ramp(bets[best], estimates['counts']),
+            'fraction': candidates[best][0],
+            'spread': candidates[best][1],
+            'ev': mean,
+            'sd': var ** 0.5,
+            'growth': float(growth[best]),
+            'ruin': float(np.exp(-2 * mean * bankroll / var)) if mean > 0 else 1.0,
+            'n0': var / mean ** 2 if mean else np.inf,
+            'candidates': [(fraction, spread, float(e), float(v) ** 0.5, float(g))
+                           for (fraction, spread), e, v, g in zip(candidates, ev, variance, growth)]}
+
+
+def to_ramp(bets, counts):
+    """per-true-count bets as (count, bet) steps for CardCounter(ramp=..., ramp_on='true')
+    Each rounded true count t covers true counts from t - 0.5, so a step starts
+    there; the first step also covers everything below it.
+    >>> to_ramp([10, 10, 50, 50, 200], [-2, -1, 0, 1, 2])
+    ((-2.5, 10), (-0.5, 50), (1.5, 200))
+    """
+    ramp = []
+    for count, bet in zip(counts, bets):
+        bet = int(bet) if float(bet).is_integer() else float(bet)
+        if not ramp or bet != ramp[-1][1]:
+            ramp.append((count - 0.5, bet))
+    return tuple(ramp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--bankroll', type=float, default=10000, help='bankroll to size bets for')
+    parser.add_argument('--min', type=float, default=10, help='table minimum bet')
+    parser.add_argument('--max', type=float, default=1000, help='table maximum bet')
+    parser.add_argument('--kelly', type=float, default=0.5, help='fraction of Kelly to be as risk-averse as')
+    parser.add_argument('--unit', type=float, default=5, help='bets are multiples of this')
+    parser.add_argument('--system', default='hilo', help='count system')
+    parser.add_argument('--evenings', type=int, default=2000, help='evenings to estimate from (cached)')
+    parser.add_argument('--hands', type=int, default=100, help='hands per evening')
+    parser.add_argument('--ndecks', type=int, default=6, help='decks per shoe')
+    parser.add_argument('--penetration', type=float, default=0.7, help='depth of shoe before reshuffling')
+    parser.add_argument('--nplayers', type=int, default=7, help='other players at the table')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the estimate')
+    parser.add_argument('--cache', default=CACHE, help='cache directory for estimates')
+    parser.add_argument('--out', help='write the ramp as JSON for CardCounter.from_file()')
+    args = parser.parse_args(argv)
+
+    estimates = cached_estimate(args.cache, evenings=args.evenings, hands=args.hands, system=args.system,
+                                ndecks=args.ndecks, penetration=args.penetration,
+                                nplayers=args.nplayers, seed=args.seed)
+    best = optimize(estimates, args.bankroll, args.min, args.max, args.kelly, unit=args.unit)
+    print('{:>9s}{:>8s}{:>10s}{:>10s}{:>12s}'.format('fraction', 'spread', 'ev', 'sd', 'growth'))
+    for fraction, spread, ev, sd, growth in best['candidates']:
+        print('{:9.2f}{:8d}{:10.3f}{:10.1f}{:12.4f}'.format(fraction, spread, ev, sd, growth))
+    print('best: {} Kelly, spread {}, ev ${:.2f}/hand, sd ${:.0f}, risk of ruin {:.1%}, N0 {:,.0f} hands'
+          .format(best['fraction'], best['spread'], best['ev'], best['sd'], best['ruin'], best['n0']))
+    print('ramp: ' + ', '.join('{:+g}: ${:g}'.format(count, bet) for count, bet in best['ramp']))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'system': args.system, 'ramp': best['ramp'], 'ramp_on': 'true',
+                       'ndecks': args.ndecks}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
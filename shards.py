@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Sharded simulation jobs for many worker hosts sharing a directory
+
+create_job(path, player, trials) - split a simulation into shards of trials in a job directory
+work(path) - claim shards and simulate them until none are left (run one per core, on any host)
+merge(path) - combine the shards' summaries into one, as a single-process run would give
+summarize_trials(results) - mergeable summary of (final, lo, hi) results
+report(summary) - p1_blackjack.summarize()'s statistics, from a (merged) summary
+
+A job directory holds job.json (strategy, simulate() parameters, trial count,
+master seed and shard size) and three subdirectories: todo/ (a file per
+unclaimed shard), claimed/ and done/. A worker claims a shard by renaming its
+file from todo/ into claimed/, which only one worker can do, and keeps the
+lease by touching the file as it goes. A claim not touched for lease seconds
+belongs to a dead worker, and is renamed back into todo/ by the next worker
+that runs out of shards. Each finished shard's summary (counts, moments,
+histograms and watermark extremes) is written to done/ atomically.
+
+Shard i simulates trials i * shard to (i + 1) * shard with the seeds
+trials.iter_trials() would give them, so the merged results depend only on
+the job and never on how many workers ran it, where, or how often they died.
+
+Usage:
+    python shards.py create /shared/job1 --player CardCounter --trials 1000000 --shard 10000
+    python shards.py work /shared/job1                (on every core of every host)
+    python shards.py merge /shared/job1
+"""
+
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import time
+from Blackjack import Soft17
+from RunningStats import RunningStats, Histogram
+from p1_blackjack import PLAYERS, HISTOGRAM_WIDTH
+from trials import _run_chunk
+
+JOB = 'job.json'
+LEASE = 300                       # seconds without a touch before a claim is taken back
+HEARTBEAT = 100                   # trials between touches of a claim
+WIDTH = HISTOGRAM_WIDTH           # histogram bin width, in dollars (as p1_blackjack.summarize)
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _dirs(path):
+    return [os.path.join(path, name) for name in ('todo', 'claimed', 'done')]
+
+
+def _write_json(path, data):
+    """write JSON atomically (another host never sees a partial file)"""
+    temp = '{}.{}.{}.tmp'.format(path, socket.gethostname(), os.getpid())
+    with open(temp, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp, path)
+
+
+def create_job(path, player, trials, seed=0, shard=1000, dealer='Soft17', player_kwargs=None, **kwargs):
+    """split a simulation into shards in a new job directory
+    :param path:           job directory (on storage every worker host can reach)
+    :param player:         name of the player strategy in p1_blackjack.PLAYERS
+    :param trials:         trials (evenings) to simulate in all
+    :param seed:           master seed, as for trials.iter_trials()
+    :param shard:          trials per shard
+    :param dealer:         name of the dealer strategy in p1_blackjack.PLAYERS
+    :param player_kwargs:  arguments for the player's constructor (e.g., ramp_on)
+    :param kwargs:         simulate() parameters (hands, ndecks, penetration, nplayers)
+    :return: number of shards
+    """
+    if player not in PLAYERS or dealer not in PLAYERS:
+        raise ValueError('{} and {} must both be in {}'.format(player, dealer, ', '.join(PLAYERS)))
+    if os.path.exists(os.path.join(path, JOB)):
+        raise FileExistsError(os.path.join(path, JOB) + ' already exists')
+    for directory in _dirs(path):
+        os.makedirs(directory, exist_ok=True)
+    shards = -(-trials // shard)
+    for i in range(shards):
+        _write_json(os.path.join(path, 'todo', '{:06d}'.format(i)), {'shard': i})
+    _write_json(os.path.join(path, JOB), {'player': player, 'dealer': dealer,
+                                          'player_kwargs': player_kwargs or {}, 'simulate': kwargs,
+                                          'trials': trials, 'seed': seed, 'shard': shard,
+                                          'shards': shards})
+    return shards
+
+
+def _claim(path, worker, lease=LEASE):
+    """claim an unclaimed shard (or a stale claim) by renaming it
+    :return: (shard number, path of the claim file), or None if there is nothing to claim
+    """
+    todo, claimed, done = _dirs(path)
+    for attempt in range(2):
+        for name in sorted(os.listdir(todo)):
+            claim = os.path.join(claimed, '{}.{}'.format(name, worker))
+            try:
+                os.rename(os.path.join(todo, name), claim)
+            except FileNotFoundError:
+                continue      # another worker claimed it first
+            os.utime(claim)   # the lease runs from the claim, not from when the shard was queued
+            return int(name), claim
+        # nothing unclaimed: put back any shard whose worker stopped touching it
+        now = time.time()
+        for name in os.listdir(claimed):
+            shard = name.split('.')[0]
+            try:
+                if os.path.exists(os.path.join(done, shard + '.json')):
+                    os.remove(os.path.join(claimed, name))
+                elif now - os.path.getmtime(os.path.join(claimed, name)) > lease:
+                    os.rename(os.path.join(claimed, name), os.path.join(todo, shard))
+            except FileNotFoundError:
+                pass          # its worker finished, or another worker put it back
+    return None
+
+
+def summarize_trials(results, width=WIDTH):
+    """mergeable summary of simulate() results
+    :param results:  iterable of (final, lo, hi)
+    :param width:    histogram bin width
+    :return: dict of RunningStats ('winnings', 'worst' and 'best' for final, lo and hi)
+             and Histograms ('histogram' of final winnings and 'worst_histogram' of lo)
+    """
+    summary = {'winnings': RunningStats(), 'worst': RunningStats(), 'best': RunningStats(),
+               'histogram': Histogram(width), 'worst_histogram': Histogram(width)}
+    _add(summary, results)
+    return summary
+
+
+def _add(summary, results):
+    winnings, worst, best = summary['winnings'], summary['worst'], summary['best']
+    histogram, worst_histogram = summary['histogram'], summary['worst_histogram']
+    for final, lo, hi in results:
+        winnings.add(final)
+        worst.add(lo)
+        best.add(hi)
+        histogram.add(final)
+        worst_histogram.add(lo)
+
+
+def merge_summaries(summaries):
+    """one summary of all the results in a list of summaries (from summarize_trials)"""
+    merged = summarize_trials(())
+    for summary in summaries:
+        for name, stats in merged.items():
+            stats.merge(summary[name])
+    return merged
+
+
+def _to_dict(summary):
+    return {name: stats.to_dict() for name, stats in summary.items()}
+
+
+def _from_dict(data):
+    return {name: (Histogram if 'histogram' in name else RunningStats).from_dict(stats)
+            for name, stats in data.items()}
+
+
+def run_shard(job, shard, claim=None):
+    """simulate one shard of a job (touching the claim file as it goes)
+    :param job:    the job's job.json contents
+    :param shard:  shard number
+    :param claim:  claim file to keep touching, or None
+    :return: the shard's summary, or None if the claim was taken back meanwhile
+    """
+    start = shard * job['shard']
+    stop = min(start + job['shard'], job['trials'])
+    master = random.Random(job['seed'])   # the seeds iter_trials() gives these trials
+    for i in range(start):
+        master.getrandbits(64)
+    seeds = [master.getrandbits(64) for i in range(start, stop)]
+    player = PLAYERS[job['player']](**job['player_kwargs'])
+    dealer = PLAYERS[job['dealer']]()
+    summary = summarize_trials(())
+    for first in range(0, len(seeds), HEARTBEAT):
+        if claim is not None:
+            try:
+                os.utime(claim)
+            except FileNotFoundError:
+                return None   # reclaimed as stale; whoever has it now will finish it
+        _add(summary, _run_chunk(player, dealer, seeds[first:first + HEARTBEAT], job['simulate']))
+    return summary
+
+
+def work(path, worker=None, lease=LEASE, limit=None):
+    """claim and simulate shards until there are none left to claim
+    :param path:    job directory
+    :param worker:  name for this worker's claims (host and process id if None)
+    :param lease:   seconds after which another worker's untouched claim is taken back
+    :param limit:   most shards to do (None for no limit)
+    :return: number of shards this worker finished
+    """
+    if worker is None:
+        worker = '{}-{}'.format(socket.gethostname(), os.getpid())
+    with open(os.path.join(path, JOB)) as f:
+        job = json.load(f)
+    done = os.path.join(path, 'done')
+    finished = 0
+    while limit is None or finished < limit:
+        claimed = _claim(path, worker, lease)
+        if claimed is None:
+            break
+        shard, claim = claimed
+        summary = run_shard(job, shard, claim)
+        if summary is None:
+            continue
+        _write_json(os.path.join(done, '{:06d}.json'.format(shard)), _to_dict(summary))
+        try:
+            os.remove(claim)
+        except FileNotFoundError:
+            pass
+        finished += 1
+    return finished
+
+
+def status(path):
+    """shards of a job in each state, as a dict of counts (todo, claimed, done)"""
+    return {os.path.basename(directory): len([name for name in os.listdir(directory)
+                                              if not name.endswith('.tmp')])
+            for directory in _dirs(path)}
+
+
+def merge(path):
+    """combine every shard's summary, in shard order
+    :return: the job's summary (see summarize_trials)
+    :raises ValueError: if any shard is not done
+    >>> import tempfile
+    >>> from concurrent.futures import ProcessPoolExecutor
+    >>> from trials import iter_trials
+    >>> from Blackjack import Basic
+    >>> path = tempfile.mkdtemp()
+    >>> create_job(path, 'Basic', 50, seed=3, shard=8, hands=20)
+    7
+    >>> _claim(path, 'dead-worker')[0]          # a worker that claims a shard and dies
+    0
+    >>> with ProcessPoolExecutor(3) as pool:    # three local processes stand in for nodes
+    ...     done = sum(pool.map(work, [path] * 3, ['node1', 'node2', 'node3']))
+    >>> done, status(path)
+    (6, {'todo': 0, 'claimed': 1, 'done': 6})
+    >>> work(path, lease=0), status(path)      # shard 0's lease runs out; it is claimed again
+    (1, {'todo': 0, 'claimed': 0, 'done': 7})
+    >>> from p1_blackjack import summarize
+    >>> sharded = report(merge(path))
+    >>> single = summarize(iter_trials(50, Basic(), seed=3, hands=20))   # as python p1_blackjack.py reports
+    >>> {key: round(value, 6) for key, value in sharded.items()} == {key: round(value, 6) for key, value in single.items()}
+    True
+    """
+    with open(os.path.join(path, JOB)) as f:
+        job = json.load(f)
+    summaries = []
+    for shard in range(job['shards']):
+        try:
+            with open(os.path.join(path, 'done', '{:06d}.json'.format(shard))) as f:
+                summaries.append(_from_dict(json.load(f)))
+        except FileNotFoundError:
+            raise ValueError('shard {} of {} is not done'.format(shard, job['shards'])) from None
+    return merge_summaries(summaries)
+
+
+def report(summary, quantiles=QUANTILES):
+    """the statistics p1_blackjack.summarize() reports, from a summary
+    Quantiles come from the histogram, as in summarize(), so a merged summary
+    reports what a single-process run does.
+    :return: dict with trials, mean, stdev, worst, best and quantiles of final winnings keyed like 'q50'
+    """
+    winnings = summary['winnings']
+    result = {'trials': winnings.n,
+              'mean': winnings.mean,
+              'stdev': winnings.stdev(),
+              'worst': min(summary['worst'].min, 0),   # the night starts at 0
+              'best': max(summary['best'].max, 0)}
+    for q in quantiles:
+        result['q{:g}'.format(100 * q)] = summary['histogram'].quantile(q)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create', help='split a simulation into shards')
+    create.add_argument('path', help='job directory')
+    create.add_argument('--player', choices=PLAYERS, default='CardCounter', help='player strategy')
+    create.add_argument('--trials', type=int, default=1000, help='evenings to simulate')
+    create.add_argument('--seed', type=int, default=0, help='master seed')
+    create.add_argument('--shard', type=int, default=1000, help='evenings per shard')
+    create.add_argument('--hands', type=int, default=100, help='hands per evening')
+    create.add_argument('--ndecks', type=int, default=6, help='decks per shoe (0 for an infinite deck)')
+    create.add_argument('--penetration', type=float, default=0.7, help='depth of shoe before reshuffling')
+    create.add_argument('--nplayers', type=int, default=7, help='other players at the table')
+    worker = commands.add_parser('work', help='simulate shards until none are left')
+    worker.add_argument('path', help='job directory')
+    worker.add_argument('--lease', type=float, default=LEASE,
+                        help='seconds before an untouched claim is taken back')
+    worker.add_argument('--name', help='worker name (host and process id by default)')
+    for command in ('merge', 'status'):
+        commands.add_parser(command, help=command + ' a job').add_argument('path', help='job directory')
+    args = parser.parse_args(argv)
+
+    if args.command == 'create':
+        shards = create_job(args.path, args.player, args.trials, args.seed, args.shard,
+                            hands=args.hands, ndecks=args.ndecks or None, penetration=args.penetration,
+                            nplayers=args.nplayers)
+        print('{} shards in {}'.format(shards, args.path))
+    elif args.command == 'work':
+        print('{} shards done'.format(work(args.path, args.name, args.lease)))
+    elif args.command == 'status':
+        print(status(args.path))
+    else:
+        for key, value in report(merge(args.path)).items():
+            print('{:10s} {}'.format(key, value if isinstance(value, int) else round(value, 2)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
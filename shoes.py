@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Recorded shoes: bulk loading and replay through the strategies
+
+parse_shoes(lines) - shoes (one per line) as int8 arrays of card ordinals, in deal order
+iter_shoes(path) - the shoes in a file, parsed a block of lines at a time
+load_shoes(path) - all the shoes in a file
+replay(shoes, player) - play every recorded shoe through play_hand(), yielding each shoe's result
+
+A shoe file has one shoe per line, in the order the cards were dealt, as
+two-character card codes (rank 2-9, T, J, Q, K, A then suit C, D, H, S, in
+either case, e.g. 'AS TD 7h') or as card ordinals (see Card.by_ordinal),
+separated by spaces or commas. Blank lines and lines starting with # are skipped.
+Card codes are converted with lookup tables over the raw bytes, so a file is
+parsed without creating a Card or a string per card.
+"""
+
+
+import numpy as np
+from Blackjack import Soft17
+from Card import Card
+from CardDeck import CardDeck
+from p1_blackjack import play_hand
+
+# ordinal of each (rank byte, suit byte) pair, -1 for anything that is not a card
+_PAIRS = np.full((256, 256), -1, dtype=np.int16)
+for _card in Card.by_ordinal:
+    for _rank in (_card.rank.upper(), _card.rank.lower()):
+        for _suit in (_card.suit.upper(), _card.suit.lower()):
+            _PAIRS[ord(_rank), ord(_suit)] = _card.ordinal
+_ALNUM = np.zeros(256, dtype=bool)
+_ALNUM[[ord(c) for c in '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz']] = True
+_SEPARATOR = np.zeros(256, dtype=bool)
+_SEPARATOR[[ord(c) for c in ' \t,\r\n']] = True
+
+
+def parse_shoes(lines):
+    """shoes, one per line, as int8 arrays of card ordinals in deal order
+    :param lines:  lines of text (see the module doc for the format)
+    :return: list of int8 arrays (those from card codes are views into one buffer)
+    >>> shoes = parse_shoes(['# two short shoes', 'AS TD 7h 2c', '', '51, 21, 31', 'qs,kd'])
+    >>> [shoe.tolist() for shoe in shoes]
+    [[51, 21, 31, 0], [51, 21, 31], [49, 24]]
+    >>> parse_shoes(['AS XX'])
+    Traceback (most recent call last):
+    ...
+    ValueError: not a card code: XX
+    >>> parse_shoes(['AST D'])
+    Traceback (most recent call last):
+    ...
+    ValueError: not a card code: AST
+    >>> parse_shoes(['51 52 0'])
+    Traceback (most recent call last):
+    ...
+    ValueError: card ordinals must be 0 to 51: 51 52 0
+    """
+    lines = [line for line in lines if line.strip() and not line.lstrip().startswith('#')]
+    ordinal = [line.replace(',', ' ').split(None, 1)[0].isdigit() for line in lines]   # not '2H'
+    codes = _parse_codes([line for line, is_ordinal in zip(lines, ordinal) if not is_ordinal])
+    shoes = []
+    for line, is_ordinal in zip(lines, ordinal):
+        if is_ordinal:
+            try:
+                shoe = np.array(line.replace(',', ' ').split(), dtype=np.int64)
+            except ValueError:
+                raise ValueError('not a line of card ordinals: ' + line.strip()) from None
+            if shoe.min() < 0 or shoe.max() > 51:
+                raise ValueError('card ordinals must be 0 to 51: ' + line.strip())
+            shoes.append(shoe.astype(np.int8))
+        else:
+            shoes.append(next(codes))
+    return shoes
+
+
+def _parse_codes(lines):
+    """shoes of two-character card codes, one per line, converted all at once
+    Tokens are the runs of letters and digits between separators (spaces, tabs
+    and commas), and each must be exactly a rank and a suit.
+    :return: iterator of int8 arrays, views into one buffer
+    """
+    if not lines:
+        return iter(())
+    data = np.frombuffer(''.join(line.rstrip('\r\n') + '\n' for line in lines).encode('ascii'), dtype=np.uint8)
+    keep = _ALNUM[data]
+    known = keep | _SEPARATOR[data]
+    if not known.all():
+        raise ValueError('not a card code separator: ' + repr(chr(data[np.argmin(known)])))
+    edges = np.diff(np.concatenate(([0], keep.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)   # of each token
+    flat = np.where(ends - starts == 2, _PAIRS[data[starts], data[starts + 1]], -1)   # data ends in '\n'
+    if np.any(flat < 0):
+        bad = int(np.argmax(flat < 0))
+        raise ValueError('not a card code: ' + data[starts[bad]:ends[bad]].tobytes().decode())
+    counts = np.bincount(np.cumsum(data == ord('\n'))[starts], minlength=len(lines))
+    return iter(np.split(flat.astype(np.int8), np.cumsum(counts)[:-1]))
+
+
+def iter_shoes(path, block=10000):
+    """the shoes in a file, parsed block lines at a time, so files of any size stream
+    :return: iterator of int8 arrays of card ordinals in deal order
+    """
+    with open(path) as f:
+        lines = []
+        for line in f:
+            lines.append(line)
+            if len(lines) >= block:
+                yield from parse_shoes(lines)
+                lines = []
+        yield from parse_shoes(lines)
+
+
+def load_shoes(path):
+    """all the shoes in a file, as a list of int8 arrays of card ordinals"""
+    return list(iter_shoes(path))
+
+
+class _RecordedDeck(CardDeck):
+    """CardDeck for replay(): dealing past the end of a recorded shoe is an error"""
+    number = 0   # of the shoe loaded, for the error
+
+    def deal(self):
+        """Remove and return the next card, checking first that there is one"""
+        if self.top == 0:
+            raise ValueError('shoe {} ran out of cards mid-hand; raise reserve'.format(self.number))
+        self.top -= 1
+        return self.cards[self.top]
+
+
+def replay(shoes, player, dealer=None, nplayers=7, penetration=1.0, reserve=None):
+    """play every recorded shoe through play_hand(), as simulate() plays a shuffled one
+    Each shoe is dealt from in its recorded order (see CardDeck.load), and hands
+    are played until the penetration is passed, or too few cards are left for a
+    whole round, whichever comes first. player.new_shoe() is called for every shoe.
+    :param shoes:        iterable of shoes (rows of card ordinals), e.g., iter_shoes(path)
+    :param player:       Blackjack object representing the player
+    :param dealer:       Blackjack object representing the dealer (a new Soft17 if None)
+    :param nplayers:     Number of other players present (not simulated, but cards seen)
+    :param penetration:  Depth of each shoe to play to
+    :param reserve:      stop a shoe when fewer cards than this are left
+                         (default: the deal plus 16 hit cards)
+    :return: iterator of (winnings, hands) for each shoe, in order
+    >>> from Blackjack import Basic
+    >>> shoes = [list(range(52)) * 2, list(range(51, -1, -1))]
+    >>> list(replay(shoes, Basic(), nplayers=0))
+    [(200.0, 17), (350.0, 7)]
+    >>> list(replay([list(range(10))], Basic(), reserve=0))
+    Traceback (most recent call last):
+    ...
+    ValueError: shoe 0 ran out of cards mid-hand; raise reserve
+    """
+    if dealer is None:
+        dealer = Soft17()
+    if reserve is None:
+        reserve = 2 * (nplayers + 2) + 16
+    deck = _RecordedDeck(0)
+    player.sits_at(deck)
+    for number, shoe in enumerate(shoes):
+        deck.load(shoe)
+        deck.number = number
+        player.new_shoe()
+        winnings = hands = 0
+        while deck.undealt() >= reserve and deck.dealt() <= penetration * deck.count():
+            winnings += play_hand(player, dealer, deck, nplayers)
+            hands += 1
+        yield winnings, hands
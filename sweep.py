@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Parameter sweeps of simulate() with an on-disk result cache
+
+expand_grid(grid) - every combination of the values in a grid spec
+point_key(player_class, point, trials, seed) - cache key for one point of a sweep
+sweep(player_class, grid) - simulate every point of a grid, in parallel, reusing cached points
+
+Grid keys that are simulate() parameters (hands, ndecks, penetration, nplayers)
+are passed to simulate(); any others (e.g., ramp or system for CardCounter) are
+passed to the player's constructor. Each point is stored in the cache directory
+as a JSON file named by a hash of the point, the strategy class, the trial count
+and the seed, so re-running or extending a sweep only simulates the new points.
+Delete the cache (or bump VERSION) when a change to the simulation alters results.
+
+Usage:
+    python sweep.py --player CardCounter --penetration 0.5 0.6 0.7 0.8 --ndecks 2 6
+"""
+
+
+import argparse
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from Blackjack import Soft17
+from RunningStats import RunningStats, Histogram
+from p1_blackjack import PLAYERS, HISTOGRAM_WIDTH, simulate
+from trials import iter_trials
+
+CACHE = 'sweep_cache'
+VERSION = 1                       # part of every key; bump to invalidate cached results
+SIMULATE_PARAMETERS = ('hands', 'ndecks', 'penetration', 'nplayers')
+
+
+def expand_grid(grid):
+    """every combination of the values in a grid spec
+    :param grid:  dict of parameter name to a list of values (or a single value)
+    :return: list of dicts, one per point, varying the last parameter fastest
+    >>> expand_grid({'ndecks': [2, 6], 'penetration': [0.5, 0.7], 'hands': 100})
+    [{'ndecks': 2, 'penetration': 0.5, 'hands': 100}, {'ndecks': 2, 'penetration': 0.7, 'hands': 100}, {'ndecks': 6, 'penetration': 0.5, 'hands': 100}, {'ndecks': 6, 'penetration': 0.7, 'hands': 100}]
+    """
+    names = list(grid)
+    values = [grid[name] if isinstance(grid[name], (list, range)) else [grid[name]] for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def point_key(player_class, point, trials, seed, dealer_class=Soft17):
+    """cache key for one point of a sweep: a hash of everything that determines its results
+    >>> from Blackjack import Basic
+    >>> point_key(Basic, {'ndecks': 6}, 100, 0) == point_key(Basic, {'ndecks': 6}, 100, 0)
+    True
+    >>> point_key(Basic, {'ndecks': 6}, 100, 0) == point_key(Basic, {'ndecks': 6}, 100, 1)
+    False
+    >>> point_key(Basic, {}, 100, 0) == point_key(Basic, {'ndecks': 6, 'hands': 100}, 100, 0)   # defaults
+    True
+    >>> import os, tempfile
+    >>> before, path = point_key(Basic, {}, 100, 0), os.path.join(tempfile.mkdtemp(), 'chart.csv')
+    >>> with open(Basic.chart_file) as f, open(path, 'w') as out:
+    ...     written = out.write(f.read().replace('hard_strategy,16,s', 'hard_strategy,16,h'))
+    >>> Basic.load_chart(path)    # an edited strategy chart
+    >>> point_key(Basic, {}, 100, 0) == before
+    False
+    >>> Basic.load_chart(Basic.chart_file)
+    """
+    # the arguments as called, defaults and all, so leaving one out keys the same as giving it
+    player_kwargs, simulate_kwargs = _split_point(point)
+    player_arguments = inspect.signature(player_class).bind(**player_kwargs)
+    player_arguments.apply_defaults()
+    simulate_arguments = inspect.signature(simulate).bind(None, **simulate_kwargs)
+    simulate_arguments.apply_defaults()
+    point = dict(player_arguments.arguments,
+                 **{name: simulate_arguments.arguments[name] for name in SIMULATE_PARAMETERS})
+    config = {'version': VERSION,
+              'player': '{}.{}'.format(player_class.__module__, player_class.__qualname__),
+              'strategy': getattr(player_class, 'table', None),   # Basic's chart, as loaded
+              'dealer': '{}.{}'.format(dealer_class.__module__, dealer_class.__qualname__),
+              'point': point,
+              'trials': trials,
+              'seed': seed}
+    text = json.dumps(config, sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def _split_point(point):
+    """(player constructor arguments, simulate() arguments) of a point"""
+    return ({name: value for name, value in point.items() if name not in SIMULATE_PARAMETERS},
+            {name: value for name, value in point.items() if name in SIMULATE_PARAMETERS})
+
+
+def _run_point(player_class, dealer_class, point, trials, seed):
+    """simulate one point of a sweep; returns its summary as JSON-ready dicts"""
+    player_kwargs, simulate_kwargs = _split_point(point)
+    winnings, worst, histogram = RunningStats(), RunningStats(), Histogram(HISTOGRAM_WIDTH)
+    for final, lo, hi in iter_trials(trials, player_class(**player_kwargs), dealer_class(),
+                                     seed=seed, **simulate_kwargs):
+        winnings.add(final)
+        worst.add(lo)
+        histogram.add(final)
+    return {'winnings': winnings.to_dict(), 'worst': worst.to_dict(), 'histogram': histogram.to_dict()}
+
+
+def _load(path):
+    """cached summary at path, or None if there is none (or it is unreadable)"""
+    try:
+        with open(path) as f:
+            return json.load(f)['summary']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save(path, point, summary):
+    """write a summary to the cache atomically, so an interrupted sweep leaves no partial files"""
+    temp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp, 'w') as f:
+        json.dump({'point': point, 'summary': summary}, f, default=repr)
+    os.replace(temp, path)
+
+
+def sweep(player_class, grid, trials=1000, seed=0, dealer_class=Soft17, workers=1, cache=CACHE):
+    """simulate every point of a grid, skipping points already in the cache
+    Every point uses the same trial seeds, so differences between points are
+    not blurred by different shuffles.
+    :param player_class:  Blackjack subclass to simulate
+    :param grid:          grid spec (see expand_grid)
+    :param trials:        trials per point
+    :param seed:          master seed for every point (part of the cache key)
+    :param dealer_class:  Blackjack subclass for the dealer
+    :param workers:       worker processes to run uncached points on (None for one per CPU)
+    :param cache:         cache directory (None to neither read nor write a cache)
+    :return: list of dicts, one per point in expand_grid order, with the 'point',
+             'winnings' and 'worst' (RunningStats of final winnings and of lo-watermarks),
+             'histogram' (Histogram of final winnings) and 'cached' (True if it was not simulated)
+    >>> import tempfile
+    >>> from Blackjack import Basic
+    >>> with tempfile.TemporaryDirectory() as cache:
+    ...     first = sweep(Basic, {'penetration': [0.5, 0.7]}, trials=5, cache=cache)
+    ...     again = sweep(Basic, {'penetration': [0.5, 0.6, 0.7]}, trials=5, cache=cache)
+    >>> [row['cached'] for row in again]
+    [True, False, True]
+    >>> again[2]['winnings'].mean == first[1]['winnings'].mean
+    True
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if cache is not None:
+        os.makedirs(cache, exist_ok=True)
+    points = expand_grid(grid)
+    paths = [None if cache is None else
+             os.path.join(cache, point_key(player_class, point, trials, seed, dealer_class) + '.json')
+             for point in points]
+    summaries = [None if path is None else _load(path) for path in paths]
+    cached = [summary is not None for summary in summaries]
+    todo = [i for i, summary in enumerate(summaries) if summary is None]
+
+    def finished(i, summary):
+        summaries[i] = summary
+        if paths[i] is not None:
+            _save(paths[i], points[i], summary)
+
+    if workers <= 1 or len(todo) <= 1:
+        for i in todo:
+            finished(i, _run_point(player_class, dealer_class, points[i], trials, seed))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {i: pool.submit(_run_point, player_class, dealer_class, points[i], trials, seed)
+                       for i in todo}
+            for i, future in futures.items():
+                finished(i, future.result())   # saved as they finish, so an interrupted sweep resumes
+
+    return [{'point': point,
+             'winnings': RunningStats.from_dict(summary['winnings']),
+             'worst': RunningStats.from_dict(summary['worst']),
+             'histogram': Histogram.from_dict(summary['histogram']),
+             'cached': was_cached}
+            for point, summary, was_cached in zip(points, summaries, cached)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--player', choices=PLAYERS, default='CardCounter', help='player strategy')
+    parser.add_argument('--trials', type=int, default=1000, help='evenings to simulate per point')
+    parser.add_argument('--seed', type=int, default=0, help='master seed for every point')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes (0 for one per CPU)')
+    parser.add_argument('--cache', default=CACHE, help='cache directory')
+    parser.add_argument('--hands', type=int, nargs='+', help='hands per evening')
+    parser.add_argument('--ndecks', type=int, nargs='+', help='decks per shoe (0 for an infinite deck)')
+    parser.add_argument('--penetration', type=float, nargs='+', help='depth of shoe before reshuffling')
+    parser.add_argument('--nplayers', type=int, nargs='+', help='other players at the table')
+    args = parser.parse_args(argv)
+
+    grid = {name: getattr(args, name) for name in SIMULATE_PARAMETERS if getattr(args, name)}
+    if 'ndecks' in grid:
+        grid['ndecks'] = [ndecks or None for ndecks in grid['ndecks']]
+    rows = sweep(PLAYERS[args.player], grid, trials=args.trials, seed=args.seed,
+                 workers=args.workers or None, cache=args.cache)
+    print('{:40s}{:>10s}{:>10s}{:>10s}{:>8s}'.format('point', 'mean', 'sem', 'worst', ''))
+    for row in rows:
+        point = ', '.join('{}={}'.format(name, value) for name, value in row['point'].items())
+        print('{:40s}{:10.1f}{:10.1f}{:10.0f}{:>8s}'.format(
+            point, row['winnings'].mean, row['winnings'].sem(), row['worst'].min,
+            'cached' if row['cached'] else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
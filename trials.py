@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Seattle University, OMSBA 5062, F21, P1 - Blackjack, Andrew Nalundasan
+
+Parallel, reproducible trial runner for p1_blackjack.simulate
+
+run_trials(trials, player) - run simulate() many times across a process pool
+iter_trials(trials, player) - the same, yielding results as they finish (constant memory)
+iter_until(budget, player, target) - trials in batches until confidence targets are met
+trial_seeds(trials, seed) - per-trial seeds derived from one master seed
+
+Every trial gets its own copy of the player and dealer and its own seed, so
+the results depend only on the master seed and never on the worker count
+or on how the trials were split between workers.
+"""
+
+
+import copy
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from Blackjack import Soft17
+from RunningStats import RunningStats, Histogram
+from p1_blackjack import simulate
+
+
+def trial_seeds(trials, seed=None):
+    """per-trial seeds derived from one master seed (fresh entropy if seed is None)
+    >>> trial_seeds(3, seed=42) == trial_seeds(3, seed=42)
+    True
+    >>> trial_seeds(2, seed=42) == trial_seeds(3, seed=42)[:2]
+    True
+    """
+    master = random.Random(seed)
+    return [master.getrandbits(64) for i in range(trials)]
+
+
+def _run_chunk(player, dealer, seeds, kwargs):
+    """run one trial per seed with fresh copies of player and dealer"""
+    results = []
+    for seed in seeds:
+        results.append(simulate(copy.deepcopy(player), copy.deepcopy(dealer),
+                                rng=random.Random(seed), **kwargs))
+    return results
+
+
+def iter_trials(trials, player, dealer=None, workers=1, seed=None, chunk=1000, **kwargs):
+    """run simulate() for a number of independent trials, yielding results as they finish
+    Only a few chunks of results are held at a time, so trial counts are not limited by memory.
+    :param trials:   number of trials to simulate
+    :param player:   player Blackjack object (copied for every trial)
+    :param dealer:   dealer Blackjack object (copied for every trial, Soft17 if None)
+    :param workers:  number of worker processes (None for one per CPU, 1 to run in-process)
+    :param seed:     master seed; the same seed gives the same results for any worker count
+    :param chunk:    most trials handed to a worker at once
+    :param kwargs:   other simulate() parameters (hands, ndecks, penetration, nplayers)
+    :return: iterator of (final, lo, hi), one per trial in trial order
+    """
+    if dealer is None:
+        dealer = Soft17()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # a few chunks per worker keeps the pool busy when trial times vary
+    chunk = max(1, min(chunk, -(-trials // (4 * workers))))
+    master = random.Random(seed)   # the same seeds, in the same order, as trial_seeds()
+
+    def chunks():
+        for start in range(0, trials, chunk):
+            yield [master.getrandbits(64) for i in range(min(chunk, trials - start))]
+
+    if workers <= 1 or trials <= 1:
+        for seeds in chunks():
+            yield from _run_chunk(player, dealer, seeds, kwargs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for seeds in chunks():
+                pending.append(pool.submit(_run_chunk, player, dealer, seeds, kwargs))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:   # the caller stopped early (see iter_until)
+                future.cancel()
+
+
+def run_trials(trials, player, dealer=None, workers=1, seed=None, **kwargs):
+    """run simulate() for a number of independent trials (see iter_trials)
+    :return: list of (final, lo, hi), one per trial in trial order
+    >>> from Blackjack import Basic
+    >>> run_trials(4, Basic(), seed=7) == run_trials(4, Basic(), workers=2, seed=7)
+    True
+    """
+    return list(iter_trials(trials, player, dealer, workers, seed, **kwargs))
+
+
+def iter_until(budget, player, dealer=None, target=None, worst_target=None, worst_q=0.05,
+               confidence=0.95, batch=1000, workers=1, seed=None, **kwargs):
+    """run trials in batches until the confidence intervals are narrow enough
+    After every batch, stop if the confidence interval on mean winnings has a
+    half-width of at most target, and the one on the worst_q quantile of the
+    worst moments (lo-watermarks) at most worst_target. Targets that are None
+    are not checked; with neither, all budget trials are run. The trials are those of iter_trials(budget, ...), so a
+    run is reproducible from its seed and batch size whatever the worker count.
+    :param budget:        most trials to run
+    :param player:        player Blackjack object (copied for every trial)
+    :param dealer:        dealer Blackjack object (copied for every trial, Soft17 if None)
+    :param target:        half-width wanted for the mean of final winnings, in dollars
+    :param worst_target:  half-width wanted for the worst_q quantile of worst moments, in dollars
+    :param worst_q:       quantile of the worst moments to pin down (0.05 is a bad night in twenty)
+    :param confidence:    confidence level of both intervals
+    :param batch:         trials between checks
+    :param kwargs:        other iter_trials() and simulate() parameters
+    :return: iterator of (final, lo, hi), one per trial, stopping once the targets are met
+    >>> from Blackjack import Basic
+    >>> results = list(iter_until(10000, Basic(), target=200, batch=50, seed=1))
+    >>> len(results) % 50, 50 <= len(results) < 10000
+    (0, True)
+    >>> len(list(iter_until(120, Basic(), target=0.01, batch=50, seed=1)))   # budget runs out
+    120
+    """
+    if target is None and worst_target is None:
+        yield from iter_trials(budget, player, dealer, workers, seed, **kwargs)
+        return
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    winnings = RunningStats()
+    worst = Histogram(10)
+    for final, lo, hi in iter_trials(budget, player, dealer, workers, seed, **kwargs):
+        yield final, lo, hi
+        winnings.add(final)
+        worst.add(lo)
+        if winnings.n % batch == 0 and \
+                (target is None or z * winnings.sem() <= target) and \
+                (worst_target is None or quantile_half_width(worst, worst_q, z) <= worst_target):
+            return
+
+
+def quantile_half_width(histogram, q, z):
+    """half-width of the distribution-free confidence interval for a quantile,
+    from the quantiles q -/+ z standard errors of a binomial proportion
+    >>> h = Histogram(1)
+    >>> for x in range(1000): h.add(x)
+    >>> round(quantile_half_width(h, 0.5, 1.96))
+    31
+    """
+    n = histogram.total
+    spread = z * (q * (1 - q) / n) ** 0.5 if n else 1.0
+    return (histogram.quantile(min(1.0, q + spread)) - histogram.quantile(max(0.0, q - spread))) / 2